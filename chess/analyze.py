@@ -0,0 +1,164 @@
+"""
+analyze.py
+
+Batch position analysis. Reads positions from an EPD or FEN file a line at a time, searches them across a pool of
+processes and writes one JSON object per position as each search finishes. Results come out in completion order, not
+input order - the line field (and id, for EPD lines that have one) says which position each is for. Scores are in
+centipawns for the side to move. A search that finds a forced mate says so with forced_mate, without a distance, while
+endings in the tablebases come with mate_in. A result whose budget ran out before depth 1 finished is marked
+incomplete and has no score, and a position that can't be read or searched gets an error instead.
+
+Only a few positions per process are queued ahead of the pool, so memory stays flat however long the file is, and
+every process has its own transposition table, so throughput grows with the number of processes. With a node budget
+each position is searched the same way whichever process picks it up, so reruns give the same answers.
+
+Run from the repository root:
+    python -m chess.analyze positions.epd > results.jsonl          # node budget, one process per core
+    python -m chess.analyze positions.epd --time 0.5 --workers 8 --output results.jsonl
+    cat positions.fen | python -m chess.analyze - --depth 4
+
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from chess import bitboard, engine, move_finder
+from chess.ordering import MoveOrderer
+
+
+default_nodes = 50000  # per position, when no budget is given
+queue_depth = 2  # positions queued per process, so none sits idle waiting for the next one to be read
+
+id_op = re.compile(r'(?:^|;)\s*id\s+"([^"]*)"')
+move_counts = re.compile(r"^\d+\s+\d+$")
+
+
+def read_positions(lines):  # (line number, FEN, EPD id or None) for each position, skipping blanks and # comments
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split(None, 4)
+        fen, ops = " ".join(fields[:4]), fields[4] if len(fields) > 4 else ""
+        if move_counts.match(ops):  # a full FEN rather than EPD operations
+            fen, ops = line, ""
+        position_id = id_op.search(ops)
+        yield line_number, fen, position_id.group(1) if position_id else None
+
+
+def analyze_position(line_number, fen, position_id, state_class, search_args):
+    result = {"line": line_number}
+    if position_id is not None:
+        result["id"] = position_id
+    result["fen"] = fen
+    try:
+        result.update(search_position(state_class.from_fen(fen), line_number, search_args))
+    except Exception as error:  # one bad position must not stop the batch
+        result["error"] = str(error) if isinstance(error, ValueError) else "%s: %s" % (type(error).__name__, error)
+    return result
+
+
+def search_position(game_state, line_number, search_args):  # the fields of a result after line, id and fen
+    result = {}
+    valid_moves = game_state.generate_valid_moves()
+    if not valid_moves:
+        result["move"] = None
+        result["result"] = "checkmate" if game_state.is_checkmate() else "stalemate"
+        return result
+
+    answer = move_finder.endgame_tablebase.best_move(game_state, valid_moves)
+    if answer is not None:  # exact, with the real distance to mate
+        move, value = answer
+        result["move"] = engine.Move(move).uci()
+        sign = 1 if value > 0 else -1
+        result["score"] = sign * move_finder.checkmate * 100 if value else 0
+        if value:  # value is the plies to mate plus one
+            result["mate_in"] = sign * (abs(value) // 2)  # moves, negative when getting mated
+        result["tablebase"] = True
+        return result
+
+    # start every position from nothing, so the answer doesn't depend on what this process searched before it
+    random.seed(line_number)
+    move_finder.transposition_table.clear()
+    search = move_finder.find_best_move(game_state, valid_moves, orderer=MoveOrderer(), book=None, tablebase=None,
+                                        **search_args)  # analysis wants a searched score, not book moves
+    result["move"] = engine.Move(search.move).uci() if search.move else None
+    if search.depth:
+        result["score"] = round(search.score * 100)  # centipawns, from the side to move's point of view
+        if abs(search.score) >= move_finder.checkmate:  # the search finds mates but doesn't count how far away
+            result["forced_mate"] = True
+    else:  # the budget ran out before depth 1 finished - the move is a guess and there is no score
+        result["incomplete"] = True
+    result["depth"] = search.depth
+    result["nodes"] = search.nodes
+    result["time"] = round(search.elapsed, 3)
+    return result
+
+
+def analyze(lines, output, workers, state_class, search_args):  # returns the number of positions and nodes searched
+    count = nodes = 0
+
+    def write(done):
+        nonlocal count, nodes
+        for future in done:
+            result = future.result()
+            output.write(json.dumps(result) + "\n")
+            count += 1
+            nodes += result.get("nodes", 0)
+        output.flush()  # whoever reads the stream sees each result as soon as it is ready
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for position in read_positions(lines):
+            if len(pending) >= workers * queue_depth:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(done)
+            pending.add(pool.submit(analyze_position, *position, state_class, search_args))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write(done)
+    return count, nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search every position in an EPD or FEN file, writing JSON lines.")
+    parser.add_argument("positions", help="EPD or FEN file, one position per line, - for standard input")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--nodes", type=int, help="nodes per position (default %d)" % default_nodes)
+    budget.add_argument("--time", type=float, metavar="SECONDS", help="seconds per position")
+    parser.add_argument("--depth", type=int, help="deepest depth to search, alone or as a cap on the budget")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (default one per core)")
+    parser.add_argument("--bitboard", action="store_true", help="use BitboardState instead of GameState")
+    parser.add_argument("--output", help="file to write to instead of standard output")
+    args = parser.parse_args()
+
+    nodes = args.nodes
+    if nodes is None and args.time is None and args.depth is None:
+        nodes = default_nodes
+    search_args = {"seconds": args.time, "depth": args.depth, "nodes": nodes}
+    state_class = bitboard.BitboardState if args.bitboard else engine.GameState
+
+    start = time.perf_counter()
+    lines = sys.stdin if args.positions == "-" else open(args.positions)
+    output = sys.stdout if args.output is None else open(args.output, "w")
+    try:
+        count, total_nodes = analyze(lines, output, max(args.workers, 1), state_class, search_args)
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print("%d positions, %d nodes in %.1fs (%.0f positions/s, %.0f nodes/s)" %
+          (count, total_nodes, elapsed, count / max(elapsed, 1e-9), total_nodes / max(elapsed, 1e-9)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+batch_evaluation.py
+
+Scores many positions at once with NumPy, for scoring datasets and tuning the evaluation. The scores are the same
+material plus piece-square totals GameState keeps while it plays, in integer centipawns with white positive, so a
+score here divided by 100 is exactly move_finder.static_score (and score_board, unless the position is mate or
+stalemate, which takes move generation to see).
+
+Positions come in as stacked int8 arrays, either 64 piece codes per position (engine.pieces order, square
+row * 8 + col) or 12 piece planes of 64 squares (one plane per piece code 1-12). Records from GameState.to_bytes can be
+turned into codes without building a GameState for each.
+
+Needs numpy (in requirements.txt), which only this module uses.
+
+"""
+
+import numpy as np
+
+from chess.engine import piece_codes, pieces, position_size
+from chess.evaluation import material_scores, position_scores
+
+
+chunk_size = 1 << 16  # positions scored per step, so the temporary arrays stay a few tens of MB
+
+# centipawns for each piece code on each square, material and position together - code 0 (empty) scores nothing
+score_table = np.zeros((len(pieces), 64), dtype=np.int32)
+for code, piece in enumerate(pieces[1:], 1):
+    score_table[code] = [material_scores[piece] + score for score in position_scores[piece]]
+plane_weights = score_table[1:].reshape(-1)  # the same, for planes flattened to 12 * 64
+
+
+def encode_boards(game_states):  # (N, 64) int8 piece codes
+    codes = np.empty((len(game_states), 64), dtype=np.int8)
+    for index, game_state in enumerate(game_states):
+        codes[index] = [piece_codes[piece] for row in game_state.board for piece in row]
+    return codes
+
+
+def codes_from_bytes(data):  # (N, 64) int8 piece codes from N GameState.to_bytes records laid end to end
+    records = np.frombuffer(data, dtype=np.uint8)
+    if records.size % position_size:
+        raise ValueError("data is not a whole number of %d byte positions" % position_size)
+    squares = records.reshape(-1, position_size)[:, :32]
+    codes = np.empty((len(squares), 64), dtype=np.int8)
+    codes[:, 0::2] = squares >> 4
+    codes[:, 1::2] = squares & 15
+    return codes
+
+
+def codes_to_planes(codes):  # (N, 12, 64) int8, a 1 where each piece is
+    codes = np.asarray(codes).reshape(-1, 64)
+    return (codes[:, None, :] == np.arange(1, len(pieces), dtype=np.int8)[None, :, None]).astype(np.int8)
+
+
+def evaluate_codes(codes):  # (N,) int32 centipawns, white positive, for (N, 64) or (N, 8, 8) piece codes
+    codes = np.asarray(codes).reshape(-1, 64)
+    if codes.size and (codes.min() < 0 or codes.max() >= len(pieces)):
+        raise ValueError("piece codes must be between 0 and %d" % (len(pieces) - 1))
+    flat_table = score_table.reshape(-1)
+    squares = np.arange(64, dtype=np.intp)
+    scores = np.empty(len(codes), dtype=np.int32)
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size].astype(np.intp)
+        scores[start:start + chunk_size] = flat_table[chunk * 64 + squares].sum(axis=1)
+    return scores
+
+
+def evaluate_planes(planes):  # (N,) int32 centipawns, white positive, for (N, 12, 64) or (N, 12, 8, 8) piece planes
+    planes = np.asarray(planes).reshape(-1, 12 * 64)
+    scores = np.empty(len(planes), dtype=np.int32)
+    for start in range(0, len(planes), chunk_size):
+        scores[start:start + chunk_size] = planes[start:start + chunk_size].astype(np.int32) @ plane_weights
+    return scores
+
+
+def evaluate(positions):  # either layout, told apart by shape
+    positions = np.asarray(positions)
+    if positions.ndim >= 3 and positions.shape[1] == 12:
+        return evaluate_planes(positions)
+    return evaluate_codes(positions)
@@ -0,0 +1,315 @@
+"""
+bitboard.py
+
+Defines BitboardState, a GameState whose move generation and attack detection run on bitboards: one 64-bit integer per
+piece type and color plus an occupancy mask per color. The 8x8 board is still kept up to date as a mailbox, so move
+encoding, scoring and drawing work exactly as they do for GameState.
+
+Squares are numbered row * 8 + col, so bit 0 is a8 and bit 63 is h1, matching the row/col layout of GameState.board.
+
+"""
+
+from chess import engine
+
+
+# rook directions first, then bishop directions (same order as GameState.find_pins_checks)
+directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+rook_directions = (0, 1, 2, 3)
+bishop_directions = (4, 5, 6, 7)
+queen_directions = (0, 1, 2, 3, 4, 5, 6, 7)
+ray_increasing = tuple(d[0] * 8 + d[1] > 0 for d in directions)  # nearest blocker is the lowest set bit
+
+
+def step_attacks(steps):  # attack masks for a piece that moves a single step in each of the given directions
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for d_row, d_col in steps:
+            end_row, end_col = row + d_row, col + d_col
+            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
+                mask |= 1 << (end_row * 8 + end_col)
+        table.append(mask)
+    return table
+
+
+def ray_masks():  # rays[direction][square] - every square from the given square to the edge of the board
+    rays = []
+    for d_row, d_col in directions:
+        table = []
+        for sq in range(64):
+            row, col = divmod(sq, 8)
+            mask = 0
+            for i in range(1, 8):
+                end_row, end_col = row + d_row * i, col + d_col * i
+                if not (0 <= end_row <= 7 and 0 <= end_col <= 7):
+                    break
+                mask |= 1 << (end_row * 8 + end_col)
+            table.append(mask)
+        rays.append(table)
+    return rays
+
+
+knight_attacks = step_attacks(((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2)))
+king_attacks = step_attacks(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+pawn_attacks = {"w": step_attacks(((-1, -1), (-1, 1))),  # squares a pawn of that color attacks
+                "b": step_attacks(((1, -1), (1, 1)))}
+rays = ray_masks()
+
+rank_masks = {row: 0xFF << (row * 8) for row in range(8)}
+
+
+def bit_squares(bb):  # yield the index of every set bit
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def first_blocker(direction, blockers):  # nearest set bit along a ray
+    if ray_increasing[direction]:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+
+def slider_attacks(sq, occupied, slide_directions):
+    attacks = 0
+    for d in slide_directions:
+        ray = rays[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[d][first_blocker(d, blockers)]
+        attacks |= ray
+    return attacks
+
+
+class BitboardState(engine.GameState):
+
+    def set_position(self, *args, **kwargs):
+        super().set_position(*args, **kwargs)
+        self.load_bitboards()
+
+    def load_bitboards(self):  # rebuild every bitboard from the mailbox board
+        self.bitboards = {color + piece: 0 for color in "wb" for piece in "PNBRQK"}  # one per piece, e.g. ["wN"]
+        self.occupancy = {"w": 0, "b": 0}  # one per color
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != "  ":
+                    self.bitboards[piece] |= 1 << (row * 8 + col)
+                    self.occupancy[piece[0]] |= 1 << (row * 8 + col)
+
+    def make_move(self, move):
+        super().make_move(move)
+        self.toggle_move(move)
+
+    def undo_move(self):
+        if len(self.move_log) != 0:
+            move = self.move_log[-1]
+            super().undo_move()
+            self.toggle_move(move)
+
+    def toggle_move(self, move):  # xor a move in or out of the bitboards, so making and undoing are the same operation
+        start_sq = move & 63
+        end_sq = (move >> 6) & 63
+        piece_moved = engine.pieces[(move >> 12) & 15]
+        piece_captured = engine.pieces[(move >> 16) & 15]
+        color = piece_moved[0]
+        enemy = "b" if color == "w" else "w"
+        start_bit = 1 << start_sq
+        end_bit = 1 << end_sq
+
+        self.bitboards[piece_moved] ^= start_bit
+        if move & engine.promotion_flag:
+            self.bitboards[color + "Q"] ^= end_bit
+        else:
+            self.bitboards[piece_moved] ^= end_bit
+        self.occupancy[color] ^= start_bit | end_bit
+
+        if move & engine.ep_flag:
+            captured_bit = 1 << ((start_sq & ~7) + (end_sq & 7))
+            self.bitboards[piece_captured] ^= captured_bit
+            self.occupancy[enemy] ^= captured_bit
+        elif piece_captured != "  ":
+            self.bitboards[piece_captured] ^= end_bit
+            self.occupancy[enemy] ^= end_bit
+
+        if move & engine.castle_flag:
+            if end_sq > start_sq:
+                rook_bits = (1 << (end_sq + 1)) | (1 << (end_sq - 1))
+            else:
+                rook_bits = (1 << (end_sq - 2)) | (1 << (end_sq + 1))
+            self.bitboards[color + "R"] ^= rook_bits
+            self.occupancy[color] ^= rook_bits
+
+    def attackers(self, sq, color, occupied):  # bitboard of the pieces of the given color attacking a square
+        bitboards = self.bitboards
+        enemy = "b" if color == "w" else "w"
+        rooks = bitboards[color + "R"] | bitboards[color + "Q"]
+        bishops = bitboards[color + "B"] | bitboards[color + "Q"]
+        return ((knight_attacks[sq] & bitboards[color + "N"])
+                | (king_attacks[sq] & bitboards[color + "K"])
+                | (pawn_attacks[enemy][sq] & bitboards[color + "P"])  # a pawn attacks sq if sq attacks it in reverse
+                | (slider_attacks(sq, occupied, rook_directions) & rooks)
+                | (slider_attacks(sq, occupied, bishop_directions) & bishops)) & occupied
+
+    def square_under_attack(self, row, col):
+        enemy = "b" if self.white_to_move else "w"
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        return self.attackers(row * 8 + col, enemy, occupied) != 0
+
+    def attack_map(self, color, x_ray=False):  # bitboard of every square the given color attacks
+        key = self.zobrist_key
+        cached = self.attack_cache.get((color, x_ray))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        bitboards = self.bitboards
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        if x_ray:  # the other king doesn't block lines
+            occupied &= ~bitboards[("b" if color == "w" else "w") + "K"]
+        attacks = king_attacks[bitboards[color + "K"].bit_length() - 1] if bitboards[color + "K"] else 0
+        for sq in bit_squares(bitboards[color + "P"]):
+            attacks |= pawn_attacks[color][sq]
+        for sq in bit_squares(bitboards[color + "N"]):
+            attacks |= knight_attacks[sq]
+        for sq in bit_squares(bitboards[color + "R"] | bitboards[color + "Q"]):
+            attacks |= slider_attacks(sq, occupied, rook_directions)
+        for sq in bit_squares(bitboards[color + "B"] | bitboards[color + "Q"]):
+            attacks |= slider_attacks(sq, occupied, bishop_directions)
+
+        self.attack_cache[(color, x_ray)] = (key, attacks)
+        return attacks
+
+    def pseudo_legal_moves(self):  # the legal generator already only costs a few mask operations per piece
+        return self.cached_moves()
+
+    def left_in_check(self):
+        ally = "b" if self.white_to_move else "w"
+        king_sq = self.bitboards[ally + "K"].bit_length() - 1
+        return self.attackers(king_sq, "w" if self.white_to_move else "b",
+                              self.occupancy["w"] | self.occupancy["b"]) != 0
+
+    def has_legal_move(self):  # full generation is cheap enough here, and it leaves the moves cached for the search
+        return len(self.cached_moves()) > 0
+
+    def generate_legal_moves(self):
+
+        moves = []
+        bitboards = self.bitboards
+        ally = "w" if self.white_to_move else "b"
+        enemy = "b" if self.white_to_move else "w"
+        own = self.occupancy[ally]
+        occupied = own | self.occupancy[enemy]
+        king_bit = bitboards[ally + "K"]
+        king_sq = king_bit.bit_length() - 1
+
+        # checks and pins - walk each ray out from the king to the first two pieces on it
+        enemy_rooks = bitboards[enemy + "R"] | bitboards[enemy + "Q"]
+        enemy_bishops = bitboards[enemy + "B"] | bitboards[enemy + "Q"]
+        check_mask = -1  # squares a non-king move has to land on - everything unless in check
+        checks = 0
+        pin_masks = {}  # pinned square -> squares it can still move to
+        for d in queen_directions:
+            ray = rays[d][king_sq]
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            first = first_blocker(d, blockers)
+            sliders = enemy_rooks if d < 4 else enemy_bishops
+            if (sliders >> first) & 1:
+                checks += 1
+                check_mask &= ray ^ rays[d][first]
+            elif (own >> first) & 1:
+                beyond = rays[d][first] & occupied
+                if beyond:
+                    second = first_blocker(d, beyond)
+                    if (sliders >> second) & 1:
+                        pin_masks[first] = ray ^ rays[d][second]
+        non_sliding = ((knight_attacks[king_sq] & bitboards[enemy + "N"])
+                       | (pawn_attacks[ally][king_sq] & bitboards[enemy + "P"]))
+        if non_sliding:
+            checks += 1
+            check_mask &= non_sliding
+        self.inCheck = checks > 0
+
+        # king moves - a square is safe if no enemy piece attacks it once the king has left its current square
+        without_king = occupied ^ king_bit
+        for end_sq in bit_squares(king_attacks[king_sq] & ~own):
+            if not self.attackers(end_sq, enemy, without_king):
+                self.add_move(king_sq, end_sq, moves)
+        if checks > 1:  # double check - only the king can move
+            return moves
+
+        for piece, slide_directions in (("R", rook_directions), ("B", bishop_directions), ("Q", queen_directions)):
+            for start_sq in bit_squares(bitboards[ally + piece]):
+                targets = slider_attacks(start_sq, occupied, slide_directions) & ~own & check_mask
+                self.add_moves(start_sq, targets & pin_masks.get(start_sq, -1), moves)
+
+        for start_sq in bit_squares(bitboards[ally + "N"]):
+            if start_sq not in pin_masks:  # a pinned knight can never move
+                self.add_moves(start_sq, knight_attacks[start_sq] & ~own & check_mask, moves)
+
+        self.pawn_moves_bb(ally, enemy, occupied, check_mask, pin_masks, king_sq, moves)
+
+        if not self.inCheck:
+            self.castle_moves_bb(ally, enemy, occupied, king_sq, moves)
+        return moves
+
+    def pawn_moves_bb(self, ally, enemy, occupied, check_mask, pin_masks, king_sq, moves):
+        direction = -8 if ally == "w" else 8
+        double_rank = rank_masks[4] if ally == "w" else rank_masks[3]
+        promotion_ranks = rank_masks[0] | rank_masks[7]
+        enemy_pieces = self.occupancy[enemy]
+        ep_bit = 1 << (self.can_ep[0] * 8 + self.can_ep[1]) if self.can_ep else 0
+
+        for start_sq in bit_squares(self.bitboards[ally + "P"]):
+            one = start_sq + direction
+            targets = 0
+            if not (occupied >> one) & 1:
+                targets |= 1 << one
+                two = one + direction
+                if 0 <= two <= 63 and (double_rank >> two) & 1 and not (occupied >> two) & 1:
+                    targets |= 1 << two
+            captures = pawn_attacks[ally][start_sq]
+            targets |= captures & enemy_pieces
+            flags = engine.promotion_flag if (promotion_ranks >> one) & 1 else 0
+            self.add_moves(start_sq, targets & check_mask & pin_masks.get(start_sq, -1), moves, flags)
+
+            if captures & ep_bit and self.ep_is_legal(start_sq, ep_bit, ally, enemy, occupied, king_sq):
+                moves.append(start_sq | (ep_bit.bit_length() - 1) << 6 | engine.piece_codes[ally + "P"] << 12 |
+                             engine.piece_codes[enemy + "P"] << 16 | engine.ep_flag)
+
+    def ep_is_legal(self, start_sq, ep_bit, ally, enemy, occupied, king_sq):
+        # en passant removes two pieces from the same rank, so play it out on the occupancy and look for attacks
+        ep_sq = ep_bit.bit_length() - 1
+        captured_bit = 1 << ((start_sq & ~7) + (ep_sq & 7))
+        after = (occupied ^ (1 << start_sq) ^ captured_bit) | ep_bit
+        self.bitboards[enemy + "P"] ^= captured_bit
+        attacked = self.attackers(king_sq, enemy, after)
+        self.bitboards[enemy + "P"] ^= captured_bit
+        return not attacked
+
+    def castle_moves_bb(self, ally, enemy, occupied, king_sq, moves):
+        if ally == "w":
+            king_side, queen_side = self.castle_rights & engine.castle_wks, self.castle_rights & engine.castle_wqs
+        else:
+            king_side, queen_side = self.castle_rights & engine.castle_bks, self.castle_rights & engine.castle_bqs
+        if king_side and not (occupied >> (king_sq + 1)) & 3:
+            if not self.attackers(king_sq + 1, enemy, occupied) and not self.attackers(king_sq + 2, enemy, occupied):
+                self.add_move(king_sq, king_sq + 2, moves, engine.castle_flag)
+        if queen_side and not (occupied >> (king_sq - 3)) & 7:
+            if not self.attackers(king_sq - 1, enemy, occupied) and not self.attackers(king_sq - 2, enemy, occupied):
+                self.add_move(king_sq, king_sq - 2, moves, engine.castle_flag)
+
+    def add_moves(self, start_sq, targets, moves, flags=0):  # packed moves from one square to every target square
+        board = self.board
+        base = start_sq | engine.piece_codes[board[start_sq >> 3][start_sq & 7]] << 12 | flags
+        while targets:
+            low = targets & -targets
+            end_sq = low.bit_length() - 1
+            moves.append(base | end_sq << 6 | engine.piece_codes[board[end_sq >> 3][end_sq & 7]] << 16)
+            targets ^= low
+
+    def add_move(self, start_sq, end_sq, moves, flags=0):
+        self.add_moves(start_sq, 1 << end_sq, moves, flags)
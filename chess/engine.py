@@ -1,17 +1,106 @@
 """
 engine.py
 
-Defines the GameState, Move, and Castling classes. Responsible for handling the computation of moves, making of moves,
+Defines the GameState and Move classes. Responsible for handling the computation of moves, making of moves,
 and undoing of moves.
 
+Moves are packed into a single int (see encode_move) so generating one costs no object allocation. Move wraps a packed
+move and decodes it on demand, for the UI and for notation.
+
 """
 
+import random
+import struct
+
+from chess.evaluation import material_scores, position_scores
+
+
+# zobrist keys - drawn from a fixed seed so a position hashes the same in every process and every run
+zobrist_rng = random.Random(0x5EED)
+zobrist_pieces = {color + piece: [zobrist_rng.getrandbits(64) for _ in range(64)]
+                  for color in "wb" for piece in "PNBRQK"}  # indexed by piece, then by row * 8 + col
+zobrist_castling = [zobrist_rng.getrandbits(64) for _ in range(16)]  # indexed by the castling rights bitmask
+zobrist_ep = [zobrist_rng.getrandbits(64) for _ in range(8)]  # indexed by the column of the en passant square
+zobrist_black = zobrist_rng.getrandbits(64)  # xored in when it is black's turn
+
+# packed moves - start square in bits 0-5, end square in bits 6-11 (squares are row * 8 + col), piece moved in bits
+# 12-15, piece captured in bits 16-19 (as indexes into pieces) and the special move flags above that
+pieces = ("  ", "wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK")
+piece_codes = {piece: code for code, piece in enumerate(pieces)}
+ep_flag = 1 << 20
+castle_flag = 1 << 21
+promotion_flag = 1 << 22
+squares_mask = 0xFFF  # start and end square - all the UI needs to tell moves apart
+
+# castling rights are a bitmask, and a move keeps only the rights in castle_masks of both of its squares - moving a
+# king or rook, or taking a rook, clears the rights that depend on it
+castle_wks, castle_wqs, castle_bks, castle_bqs = 1, 2, 4, 8
+castle_masks = [15] * 64
+castle_masks[60] = 15 & ~(castle_wks | castle_wqs)  # e1
+castle_masks[63] = 15 & ~castle_wks  # h1
+castle_masks[56] = 15 & ~castle_wqs  # a1
+castle_masks[4] = 15 & ~(castle_bks | castle_bqs)  # e8
+castle_masks[7] = 15 & ~castle_bks  # h8
+castle_masks[0] = 15 & ~castle_bqs  # a8
+
+# positions - as FEN text, or packed into position_size bytes by GameState.to_bytes: one nibble per square holding the
+# piece code (a8 first, two squares per byte), then side to move and castling rights, en passant square plus one,
+# halfmove clock and fullmove number
+start_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+fen_castling = (("K", castle_wks), ("Q", castle_wqs), ("k", castle_bks), ("q", castle_bqs))
+# (king, rook) home squares each castling right needs
+castle_homes = ((castle_wks, "w", (7, 4), (7, 7)), (castle_wqs, "w", (7, 4), (7, 0)),
+                (castle_bks, "b", (0, 4), (0, 7)), (castle_bqs, "b", (0, 4), (0, 0)))
+position_format = struct.Struct(">32sBBBH")
+position_size = position_format.size
+
+# piece movement patterns - rook directions first, then bishop directions
+line_directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+knight_directions = ((-2, -1), (-2, 1), (-1, 2), (1, 2), (2, -1), (2, 1), (-1, -2), (1, -2))
+
+map_threshold = 3  # king moves to check before building an attack map beats checking each square on its own
+
+
+def score_delta(move):  # (material, position) score change a packed move makes, in centipawns, white positive
+    delta = score_deltas.get(move)
+    if delta is None:
+        start, end = move & 63, (move >> 6) & 63
+        piece_moved, piece_captured = pieces[(move >> 12) & 15], pieces[(move >> 16) & 15]
+        placed = piece_moved[0] + "Q" if move & promotion_flag else piece_moved
+        material = material_scores[placed] - material_scores[piece_moved]
+        position = position_scores[placed][end] - position_scores[piece_moved][start]
+        if piece_captured != "  ":
+            captured_sq = (start & ~7) | (end & 7) if move & ep_flag else end
+            material -= material_scores[piece_captured]
+            position -= position_scores[piece_captured][captured_sq]
+        if move & castle_flag:
+            rook = position_scores[piece_moved[0] + "R"]
+            position += rook[end - 1] - rook[end + 1] if end > start else rook[end + 1] - rook[end - 2]
+        delta = score_deltas[move] = (material, position)
+    return delta
+
+
+score_deltas = {}  # the change only depends on the packed move, so work it out once per distinct move
+
+
+def encode_move(start, end, board, ep=False, castle=False):  # pack a move made on the given board into an int
+    piece_moved = board[start[0]][start[1]]
+    move = start[0] * 8 + start[1] | (end[0] * 8 + end[1]) << 6 | piece_codes[piece_moved] << 12
+    if ep:
+        return move | piece_codes[("w" if piece_moved[0] == "b" else "b") + "P"] << 16 | ep_flag
+    move |= piece_codes[board[end[0]][end[1]]] << 16
+    if castle:
+        move |= castle_flag
+    elif piece_moved[1] == "P" and (end[0] == 0 or end[0] == 7):
+        move |= promotion_flag
+    return move
+
 
 class GameState:  # tracks the current state of the game
 
     def __init__(self):
 
-        self.board = [
+        board = [
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
             ["bP", "bP", "bP", "bP", "bP", "bP", "bP", "bP"],
             ["  ", "  ", "  ", "  ", "  ", "  ", "  ", "  "],
@@ -21,148 +110,348 @@ class GameState:  # tracks the current state of the game
             ["wP", "wP", "wP", "wP", "wP", "wP", "wP", "wP"],
             ["wR", "wN", "wB", "wQ", "wK", "wB", "wN", "wR"]
         ]
-        self.white_to_move = True  # which color's turn
-        self.move_log = []  # running log of moves
         self.move_funcs = {"P": self.pawn_moves,
                            "R": self.rook_moves,
                            "N": self.knight_moves,
                            "B": self.bishop_moves,
                            "Q": self.queen_moves,
                            "K": self.king_moves}
-        self.w_king_loc = (7, 4)  # white king's location
-        self.b_king_loc = (0, 4)  # black king's location
+        self.set_position(board, True, castle_wks | castle_wqs | castle_bks | castle_bqs)
+
+    def set_position(self, board, white_to_move, castle_rights=0, can_ep=(), halfmove_clock=0, fullmove_number=1):
+        # start over from a position - everything else about it is worked out from these, and the move history is lost
+        if sum(row.count("wK") for row in board) != 1 or sum(row.count("bK") for row in board) != 1:
+            raise ValueError("a position needs exactly one king of each color")
+        if any(piece[1] == "P" for piece in board[0] + board[7]):
+            raise ValueError("pawns can't stand on the first or last rank")
+        enemy_king = "bK" if white_to_move else "wK"
+        king_row, king_col = next((row, col) for row in range(8) for col in range(8) if board[row][col] == enemy_king)
+        if self.attacked_by(king_row, king_col, "w" if white_to_move else "b", board):
+            raise ValueError("the side not to move is in check")
+        for right, color, (king_row, king_col), (rook_row, rook_col) in castle_homes:
+            if castle_rights & right and (board[king_row][king_col] != color + "K" or
+                                          board[rook_row][rook_col] != color + "R"):
+                raise ValueError("castling rights without the king and rook on their home squares")
+        if can_ep:  # the square a pawn just skipped over, with that pawn in front of it
+            ep_row, ep_col = can_ep
+            pawn_row, enemy_pawn = (ep_row + 1, "bP") if white_to_move else (ep_row - 1, "wP")
+            if ep_row != (2 if white_to_move else 5) or not 0 <= ep_col < 8 or board[pawn_row][ep_col] != enemy_pawn:
+                raise ValueError("en passant square without a pawn that just moved two squares past it")
+        self.board = board
+        self.white_to_move = white_to_move  # which color's turn
+        self.move_log = []  # running log of moves
+        self.ply_offset = 2 * (fullmove_number - 1) + (not white_to_move)  # plies played before move_log starts
+        self.piece_locs = self.find_piece_locs()  # (row, col) of every piece, by color
+        self.material_score, self.position_score = self.compute_scores()  # centipawns, white positive
+        self.w_king_loc = next(loc for loc in self.piece_locs["w"] if board[loc[0]][loc[1]] == "wK")
+        self.b_king_loc = next(loc for loc in self.piece_locs["b"] if board[loc[0]][loc[1]] == "bK")
         self.pins = []  # pins in the current game state
         self.checks = []  # checks in the current game state
         self.inCheck = False  # whether a king is in check
-        self.can_ep = ()  # coordinates for en passant square
-        self.castle_rights = Castling(True, True, True, True)  # current castling rights for both colors
-        self.castling_log = [Castling(self.castle_rights.wks, self.castle_rights.wqs,
-                                      self.castle_rights.bks, self.castle_rights.bqs)]
+        self.can_ep = can_ep  # coordinates for en passant square
+        self.castle_rights = castle_rights  # castle_wks | castle_wqs | castle_bks | castle_bqs
+        self.halfmove_clock = halfmove_clock  # moves since the last capture or pawn move, for the fifty move rule
+        self.zobrist = self.compute_zobrist()  # hash of the current position
+        self.undo_log = []  # one packed undo record per move made
+        self.attack_cache = {}  # (color, x_ray) -> (zobrist key, attack map) for the last position of each
+        self.move_cache = (None, [], False)  # (zobrist key, legal moves, in check) for the last position generated
 
         self.checkmate = False
         self.stalemate = False
 
+    @classmethod
+    def from_fen(cls, fen):
+        game_state = cls()
+        game_state.set_fen(fen)
+        return game_state
+
+    def set_fen(self, fen):  # the halfmove clock and move number are optional
+        fields = fen.split()
+        if len(fields) < 4 or fields[1] not in ("w", "b"):
+            raise ValueError("not a FEN string: " + repr(fen))
+        board = []
+        for rank in fields[0].split("/"):
+            row = []
+            for char in rank:
+                if char.isdigit():
+                    row += ["  "] * int(char)
+                elif char.upper() in "PNBRQK":
+                    row.append(("w" if char.isupper() else "b") + char.upper())
+                else:
+                    raise ValueError("bad piece " + repr(char) + " in FEN: " + repr(fen))
+            board.append(row)
+        if len(board) != 8 or any(len(row) != 8 for row in board):
+            raise ValueError("FEN board is not 8x8: " + repr(fen))
+
+        castle_rights = 0
+        for char, right in fen_castling:
+            if char in fields[2]:
+                castle_rights |= right
+        try:
+            can_ep = () if fields[3] == "-" else (Move.ranks_to_rows[fields[3][1]], Move.files_to_cols[fields[3][0]])
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except (KeyError, IndexError, ValueError):
+            raise ValueError("bad en passant square or move counts in FEN: " + repr(fen)) from None
+        self.set_position(board, fields[1] == "w", castle_rights, can_ep, halfmove_clock, fullmove_number)
+
+    def to_fen(self):
+        ranks = []
+        for row in self.board:
+            rank, empty = "", 0
+            for piece in row:
+                if piece == "  ":
+                    empty += 1
+                    continue
+                if empty:
+                    rank, empty = rank + str(empty), 0
+                rank += piece[1] if piece[0] == "w" else piece[1].lower()
+            ranks.append(rank + (str(empty) if empty else ""))
+        castling = "".join(char for char, right in fen_castling if self.castle_rights & right) or "-"
+        ep = Move.cols_to_files[self.can_ep[1]] + Move.rows_to_ranks[self.can_ep[0]] if self.can_ep else "-"
+        return " ".join(("/".join(ranks), "w" if self.white_to_move else "b", castling, ep, str(self.halfmove_clock),
+                         str(self.fullmove_number())))
+
+    @classmethod
+    def from_bytes(cls, data):
+        game_state = cls()
+        game_state.set_bytes(data)
+        return game_state
+
+    def set_bytes(self, data):  # position_size bytes from to_bytes
+        squares, flags, ep, halfmove_clock, fullmove_number = position_format.unpack(data)
+        codes = [nibble for byte in squares for nibble in (byte >> 4, byte & 15)]
+        if max(codes) >= len(pieces):
+            raise ValueError("bad piece code in packed position")
+        board = [[pieces[code] for code in codes[row * 8:row * 8 + 8]] for row in range(8)]
+        self.set_position(board, not flags & 16, flags & 15, divmod(ep - 1, 8) if ep else (), halfmove_clock,
+                          fullmove_number)
+
+    def to_bytes(self):  # position_size bytes - no move history, just what is needed to carry on from here
+        codes = [piece_codes[piece] for row in self.board for piece in row]
+        squares = bytes(codes[i] << 4 | codes[i + 1] for i in range(0, 64, 2))
+        flags = (0 if self.white_to_move else 16) | self.castle_rights
+        ep = self.can_ep[0] * 8 + self.can_ep[1] + 1 if self.can_ep else 0
+        return position_format.pack(squares, flags, ep, min(self.halfmove_clock, 255),
+                                    min(self.fullmove_number(), 0xFFFF))
+
+    def fullmove_number(self):
+        return (self.ply_offset + len(self.move_log)) // 2 + 1
+
+    @property
+    def zobrist_key(self):  # 64-bit hash of the current position
+        return self.zobrist
+
+    def compute_zobrist(self):  # hash the position from scratch - make_move and undo_move keep it up to date after this
+        key = 0
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col] != "  ":
+                    key ^= zobrist_pieces[self.board[row][col]][row * 8 + col]
+        key ^= zobrist_castling[self.castle_rights]
+        if self.can_ep:
+            key ^= zobrist_ep[self.can_ep[1]]
+        if not self.white_to_move:
+            key ^= zobrist_black
+        return key
+
+    def find_piece_locs(self):  # scan the board once - make_move and undo_move keep the locations up to date after this
+        piece_locs = {"w": set(), "b": set()}
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col] != "  ":
+                    piece_locs[self.board[row][col][0]].add((row, col))
+        return piece_locs
+
+    def compute_scores(self):  # material and piece-square totals from scratch - make_move and undo_move keep them after
+        material = position = 0
+        for color in ("w", "b"):
+            for row, col in self.piece_locs[color]:
+                material += material_scores[self.board[row][col]]
+                position += position_scores[self.board[row][col]][row * 8 + col]
+        return material, position
+
     def is_checkmate(self):
-        if self.inCheck and len(self.generate_valid_moves()) == 0:
+        if not self.has_legal_move() and self.inCheck:
             self.checkmate = True
             return True
 
     def is_stalemate(self):
-        if not self.inCheck and len(self.generate_valid_moves()) == 0:
+        if not self.has_legal_move() and not self.inCheck:
             self.stalemate = True
             return True
 
-    def make_move(self, move):
+    def repetitions(self):  # earlier times the current position came up - 2 means this is a threefold repetition
+        # only positions with the same side to move since the last capture or pawn move can match, and each undo
+        # record holds the key from before its move
+        count = 0
+        for index in range(len(self.undo_log) - 2, max(len(self.undo_log) - 1 - self.halfmove_clock, -1), -2):
+            if self.undo_log[index] >> 24 == self.zobrist:
+                count += 1
+        return count
+
+    def make_move(self, move):  # move is a packed int, see encode_move
+
+        start_row, start_col, end_row, end_col = (move >> 3) & 7, move & 7, (move >> 9) & 7, (move >> 6) & 7
+        piece_moved, piece_captured = pieces[(move >> 12) & 15], pieces[(move >> 16) & 15]
+
+        self.undo_log.append(self.pack_undo())
+        key = self.zobrist ^ zobrist_black ^ zobrist_castling[self.castle_rights]
+        if self.can_ep:
+            key ^= zobrist_ep[self.can_ep[1]]
 
-        self.board[move.start_row][move.start_col] = "  "  # make initial space empty
-        self.board[move.end_row][move.end_col] = move.piece_moved  # place piece in end space
+        self.board[start_row][start_col] = "  "  # make initial space empty
+        self.board[end_row][end_col] = piece_moved  # place piece in end space
         self.move_log.append(move)  # update log
         self.white_to_move = not self.white_to_move  # switch player turn
+        material, position = score_delta(move)
+        self.material_score += material
+        self.position_score += position
+
+        # move the piece in the piece lists - an en passant capture is not on the end square
+        color, enemy = piece_moved[0], piece_captured[0]
+        self.piece_locs[color].remove((start_row, start_col))
+        self.piece_locs[color].add((end_row, end_col))
+        if move & ep_flag:
+            self.piece_locs[enemy].remove((start_row, end_col))
+        elif piece_captured != "  ":
+            self.piece_locs[enemy].remove((end_row, end_col))
+
+        # keep track of the kings
+        if piece_moved == "wK":
+            self.w_king_loc = (end_row, end_col)
+        elif piece_moved == "bK":
+            self.b_king_loc = (end_row, end_col)
 
         # handling pawn promotion
-        if move.is_pawn_prom:
-            self.board[move.end_row][move.end_col] = move.piece_moved[0] + "Q"
+        if move & promotion_flag:
+            self.board[end_row][end_col] = piece_moved[0] + "Q"
+        key ^= zobrist_pieces[piece_moved][start_row * 8 + start_col] ^ \
+            zobrist_pieces[self.board[end_row][end_col]][end_row * 8 + end_col]
 
         # handling en passant moves
-        if move.is_ep_move:
-            self.board[move.start_row][move.start_col] = "  "
-            self.board[move.start_row][move.end_col] = "  "
-        if move.piece_moved[1] == "P" and abs(move.start_row - move.end_row) == 2:
-            self.can_ep = ((move.start_row + move.end_row)//2, move.start_col)
+        if move & ep_flag:
+            self.board[start_row][start_col] = "  "
+            self.board[start_row][end_col] = "  "
+            key ^= zobrist_pieces[piece_captured][start_row * 8 + end_col]
+        elif piece_captured != "  ":
+            key ^= zobrist_pieces[piece_captured][end_row * 8 + end_col]
+        if piece_moved[1] == "P" and abs(start_row - end_row) == 2:
+            self.can_ep = ((start_row + end_row)//2, start_col)
+            key ^= zobrist_ep[start_col]
         else:
             self.can_ep = ()
+        if piece_moved[1] == "P" or piece_captured != "  ":
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
 
         # handling castling rights
-        self.update_castle_rights(move)
-        self.castling_log.append(Castling(self.castle_rights.wks, self.castle_rights.wqs,
-                                          self.castle_rights.bks, self.castle_rights.bqs))
+        self.castle_rights &= castle_masks[move & 63] & castle_masks[(move >> 6) & 63]
+        key ^= zobrist_castling[self.castle_rights]
 
         # handling castle moves
-        if move.is_castle_move:
-            if move.end_col - move.start_col == 2:
-                self.board[move.end_row][move.end_col - 1] = move.piece_moved[0] + "R"
-                self.board[move.end_row][move.end_col + 1] = "  "
+        if move & castle_flag:
+            rook = zobrist_pieces[piece_moved[0] + "R"]
+            if end_col - start_col == 2:
+                self.board[end_row][end_col - 1] = piece_moved[0] + "R"
+                self.board[end_row][end_col + 1] = "  "
+                key ^= rook[end_row * 8 + end_col - 1] ^ rook[end_row * 8 + end_col + 1]
+                self.piece_locs[color].remove((end_row, end_col + 1))
+                self.piece_locs[color].add((end_row, end_col - 1))
             else:
-                self.board[move.end_row][move.end_col + 1] = move.piece_moved[0] + "R"
-                self.board[move.end_row][move.end_col - 2] = "  "
+                self.board[end_row][end_col + 1] = piece_moved[0] + "R"
+                self.board[end_row][end_col - 2] = "  "
+                key ^= rook[end_row * 8 + end_col + 1] ^ rook[end_row * 8 + end_col - 2]
+                self.piece_locs[color].remove((end_row, end_col - 2))
+                self.piece_locs[color].add((end_row, end_col + 1))
+        self.zobrist = key
+
+    def pack_undo(self):
+        # one packed int per move, for what undo_move can't work back out from the move itself: castling rights in
+        # bits 0-3, en passant square plus one (0 for none) in bits 4-10, halfmove clock in bits 11-23 and the
+        # zobrist key from bit 24 up
+        ep = self.can_ep[0] * 8 + self.can_ep[1] + 1 if self.can_ep else 0
+        return self.zobrist << 24 | self.halfmove_clock << 11 | ep << 4 | self.castle_rights
+
+    def unpack_undo(self, record):
+        self.castle_rights = record & 15
+        ep = (record >> 4) & 127
+        self.can_ep = divmod(ep - 1, 8) if ep else ()
+        self.halfmove_clock = (record >> 11) & 0x1FFF
+        self.zobrist = record >> 24
 
     def undo_move(self):
 
         if len(self.move_log) != 0:  # only if there is a move to undo, do the reverse of make move
             move = self.move_log.pop()
-            self.board[move.start_row][move.start_col] = move.piece_moved
-            self.board[move.end_row][move.end_col] = move.piece_captured
+            start_row, start_col, end_row, end_col = (move >> 3) & 7, move & 7, (move >> 9) & 7, (move >> 6) & 7
+            piece_moved, piece_captured = pieces[(move >> 12) & 15], pieces[(move >> 16) & 15]
+            self.board[start_row][start_col] = piece_moved
+            self.board[end_row][end_col] = piece_captured
             self.white_to_move = not self.white_to_move
+            material, position = score_delta(move)
+            self.material_score -= material
+            self.position_score -= position
+
+            color, enemy = piece_moved[0], piece_captured[0]
+            self.piece_locs[color].remove((end_row, end_col))
+            self.piece_locs[color].add((start_row, start_col))
+            if move & ep_flag:
+                self.piece_locs[enemy].add((start_row, end_col))
+            elif piece_captured != "  ":
+                self.piece_locs[enemy].add((end_row, end_col))
+
+            if piece_moved == "wK":
+                self.w_king_loc = (start_row, start_col)
+            elif piece_moved == "bK":
+                self.b_king_loc = (start_row, start_col)
 
             # undo en passant move
-            if move.is_ep_move:
-                self.board[move.end_row][move.end_col] = "  "
-                self.board[move.start_row][move.end_col] = move.piece_captured
-                self.can_ep = (move.end_row, move.end_col)
-
-            if move.piece_moved[1] == "P" and abs(move.start_row - move.end_row) == 2:
-                self.can_ep = ()
-
-            # undo change in castling rights
-            self.castling_log.pop()
-            self.castle_rights = self.castling_log[-1]
+            if move & ep_flag:
+                self.board[end_row][end_col] = "  "
+                self.board[start_row][end_col] = piece_captured
+            # en passant square, castling rights, clock and hash
+            self.unpack_undo(self.undo_log.pop())
 
             # undo castle move
-            if move.is_castle_move:
-                if move.end_col - move.start_col == 2:
-                    self.board[move.end_row][move.end_col+1] = move.piece_moved[0] + "R"
-                    self.board[move.end_row][move.end_col-1] = "  "
+            if move & castle_flag:
+                if end_col - start_col == 2:
+                    self.board[end_row][end_col+1] = piece_moved[0] + "R"
+                    self.board[end_row][end_col-1] = "  "
+                    self.piece_locs[color].remove((end_row, end_col - 1))
+                    self.piece_locs[color].add((end_row, end_col + 1))
                 else:
-                    self.board[move.end_row][move.end_col + 1] = "  "
-                    self.board[move.end_row][move.end_col - 2] = move.piece_moved[0] + "R"
+                    self.board[end_row][end_col + 1] = "  "
+                    self.board[end_row][end_col - 2] = piece_moved[0] + "R"
+                    self.piece_locs[color].remove((end_row, end_col + 1))
+                    self.piece_locs[color].add((end_row, end_col - 2))
             self.checkmate = False
             self.stalemate = False
 
-    def update_castle_rights(self, move):  # take away castling rights based on moves made
-
-        # if a king or corresponding rook gets moved, certain castling rights are lost
-        if move.piece_moved == "wK":
-            self.castle_rights.wks = False
-            self.castle_rights.wqs = False
-        elif move.piece_moved == "bK":
-            self.castle_rights.bks = False
-            self.castle_rights.bqs = False
-        elif move.piece_moved == "wR":
-            if move.start_row == 7:
-                if move.start_col == 0:
-                    self.castle_rights.wqs = False
-                elif move.start_col == 7:
-                    self.castle_rights.wks = False
-        elif move.piece_moved == "bR":
-            if move.start_row == 7:
-                if move.start_col == 0:
-                    self.castle_rights.bqs = False
-                elif move.start_col == 7:
-                    self.castle_rights.bks = False
-
-        # if a rook is captured, you can't castle on that side
-        if move.piece_captured == 'wR':
-            if move.end_row == 7:
-                if move.end_col == 0:
-                    self.castle_rights.wqs = False
-                elif move.end_col == 7:
-                    self.castle_rights.wks = False
-        elif move.piece_captured == 'bR':
-            if move.end_row == 0:
-                if move.end_col == 0:
-                    self.castle_rights.bqs = False
-                elif move.end_col == 7:
-                    self.castle_rights.bks = False
+    def make_null_move(self):  # pass the turn without moving - for null move pruning, never for a real game
+        self.undo_log.append(self.pack_undo())
+        self.zobrist ^= zobrist_black
+        if self.can_ep:
+            self.zobrist ^= zobrist_ep[self.can_ep[1]]
+        self.can_ep = ()
+        self.white_to_move = not self.white_to_move
+
+    def undo_null_move(self):
+        self.unpack_undo(self.undo_log.pop())
+        self.white_to_move = not self.white_to_move
+
+    def has_pieces(self, color):  # anything besides pawns and the king - without them zugzwang is a real risk
+        for row, col in self.piece_locs[color]:
+            if self.board[row][col][1] not in "PK":
+                return True
+        return False
 
     def generate_possible_moves(self):  # generate all possible moves in the current game state
         moves = []
 
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                turn = self.board[row][col][0]
-                if (turn == "w" and self.white_to_move) or (turn == "b" and not self.white_to_move):
-                    piece = self.board[row][col][1]
-                    self.move_funcs[piece](row, col, moves)
+        for row, col in self.piece_locs["w" if self.white_to_move else "b"]:
+            self.move_funcs[self.board[row][col][1]](row, col, moves)
         return moves
 
     def pawn_moves(self, row, col, moves):  # generate all possible pawn moves
@@ -180,44 +469,39 @@ class GameState:  # tracks the current state of the game
                 self.pins.remove(self.pins[i])
                 break
 
-        if self.white_to_move:
-            if self.board[row+(1*direction)][col] == "  ":  # forward movement
-                if not pinned or pin_d == (-1, 0):  # this move is only valid if it isn't pinned
-                    moves.append(Move((row, col), (row+(1*direction), col), self.board))
-                    if row == start_row and self.board[row+(2*direction)][col] == "  ":
-                        moves.append(Move((row, col), (row + (2*direction), col), self.board))
-            if col - 1 >= 0:  # left capture
-                if self.board[row + (1*direction)][col - 1][0] == enemy:
-                    if not pinned or pin_d == (-1, -1):
-                        moves.append(Move((row, col), (row + (1*direction), col-1), self.board))
-                elif (row-1, col-1) == self.can_ep:  # add en passant move
-                    moves.append(Move((row, col), (row + (1 * direction), col - 1), self.board, ep=True))
-            if col + 1 <= 7:  # right capture
-                if self.board[row + (1*direction)][col + 1][0] == enemy:
-                    if not pinned or pin_d == (-1, 1):
-                        moves.append(Move((row, col), (row + (1*direction), col + 1), self.board))
-                elif (row-1, col+1) == self.can_ep:  # add en passant move
-                    moves.append(Move((row, col), (row + (1 * direction), col + 1), self.board, ep=True))
-
-        # the same here except for black in the downward direction
-        else:
-            if self.board[row+(1*direction)][col] == "  ":
-                if not pinned or pin_d == (1, 0):
-                    moves.append(Move((row, col), (row+(1*direction), col), self.board))
-                    if row == start_row and self.board[row+(2*direction)][col] == "  ":
-                        moves.append(Move((row, col), (row + (2*direction), col), self.board))
-            if col - 1 >= 0:
-                if self.board[row + (1*direction)][col - 1][0] == enemy:
-                    if not pinned or pin_d == (1, -1):
-                        moves.append(Move((row, col), (row + (1*direction), col-1), self.board))
-                elif (row+1, col-1) == self.can_ep:
-                    moves.append(Move((row, col), (row + (1 * direction), col - 1), self.board, ep=True))
-            if col + 1 <= 7:
-                if self.board[row + (1*direction)][col + 1][0] == enemy:
-                    if not pinned or pin_d == (1, 1):
-                        moves.append(Move((row, col), (row + (1*direction), col + 1), self.board))
-                elif (row+1, col+1) == self.can_ep:
-                    moves.append(Move((row, col), (row + (1 * direction), col + 1), self.board, ep=True))
+        base = row * 8 + col | piece_codes[self.board[row][col]] << 12
+        end_row = row + direction
+        if end_row == 0 or end_row == 7:
+            base |= promotion_flag
+
+        # a pinned pawn can still move along the line of its pin, towards or away from its king
+        if self.board[end_row][col] == "  ":  # forward movement
+            if not pinned or pin_d in ((direction, 0), (-direction, 0)):
+                moves.append(base | (end_row * 8 + col) << 6)
+                if row == start_row and self.board[end_row + direction][col] == "  ":
+                    moves.append(base | ((end_row + direction) * 8 + col) << 6)
+        for d_col in (-1, 1):  # left and right captures
+            end_col = col + d_col
+            if 0 <= end_col <= 7 and (not pinned or pin_d in ((direction, d_col), (-direction, -d_col))):
+                end_piece = self.board[end_row][end_col]
+                if end_piece[0] == enemy:
+                    moves.append(base | (end_row * 8 + end_col) << 6 | piece_codes[end_piece] << 16)
+                elif (end_row, end_col) == self.can_ep and self.ep_is_legal(row, col, end_col):
+                    moves.append(encode_move((row, col), (end_row, end_col), self.board, ep=True))
+
+    def ep_is_legal(self, row, col, end_col):
+        # en passant takes two pawns off the same rank, which can expose the king along it - so play it out and see
+        direction = -1 if self.white_to_move else 1
+        pawn = self.board[row][col]
+        captured = self.board[row][end_col]
+        self.board[row][col] = "  "
+        self.board[row][end_col] = "  "
+        self.board[row + direction][end_col] = pawn
+        in_check = self.find_pins_checks()[0]
+        self.board[row][col] = pawn
+        self.board[row][end_col] = captured
+        self.board[row + direction][end_col] = "  "
+        return not in_check
 
     def rook_moves(self, row, col, moves):
 
@@ -234,6 +518,7 @@ class GameState:  # tracks the current state of the game
                     self.pins.remove(self.pins[i])
                 break
 
+        base = row * 8 + col | piece_codes[self.board[row][col]] << 12
         for d in directions:
             for i in range(1, 8):
                 end_row = row + d[0] * i
@@ -242,9 +527,9 @@ class GameState:  # tracks the current state of the game
                     if not pinned or pin_d == d or pin_d == (-d[0], -d[1]):
                         end_piece = self.board[end_row][end_col]
                         if end_piece == "  ":
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            moves.append(base | (end_row * 8 + end_col) << 6)
                         elif end_piece[0] == enemy:
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            moves.append(base | (end_row * 8 + end_col) << 6 | piece_codes[end_piece] << 16)
                             break
                         else:
                             break
@@ -266,6 +551,7 @@ class GameState:  # tracks the current state of the game
                 self.pins.remove(self.pins[i])
                 break
 
+        base = row * 8 + col | piece_codes[self.board[row][col]] << 12
         for d in directions:
             for i in range(1, 8):
                 end_row = row + d[0] * i
@@ -274,9 +560,9 @@ class GameState:  # tracks the current state of the game
                     if not pinned or pin_d == d or pin_d == (-d[0], -d[1]):
                         end_piece = self.board[end_row][end_col]
                         if end_piece == "  ":
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            moves.append(base | (end_row * 8 + end_col) << 6)
                         elif end_piece[0] == enemy:
-                            moves.append(Move((row, col), (end_row, end_col), self.board))
+                            moves.append(base | (end_row * 8 + end_col) << 6 | piece_codes[end_piece] << 16)
                             break
                         else:
                             break
@@ -295,6 +581,7 @@ class GameState:  # tracks the current state of the game
                 self.pins.remove(self.pins[i])
                 break
 
+        base = row * 8 + col | piece_codes[self.board[row][col]] << 12
         for d in directions:
             end_row = row + d[0]
             end_col = col + d[1]
@@ -302,7 +589,7 @@ class GameState:  # tracks the current state of the game
                 if not pinned:
                     end_piece = self.board[end_row][end_col]
                     if end_piece[0] != ally:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
+                        moves.append(base | (end_row * 8 + end_col) << 6 | piece_codes[end_piece] << 16)
 
     def queen_moves(self, row, col, moves):
         self.rook_moves(row, col, moves)
@@ -313,61 +600,247 @@ class GameState:  # tracks the current state of the game
         row_moves = (-1, -1, -1, 0, 0, 1, 1, 1)
         col_moves = (-1, 0, 1, -1, 1, -1, 0, 1)
         ally = "w" if self.white_to_move else "b"
-
+        base = row * 8 + col | piece_codes[self.board[row][col]] << 12
+        targets = []
         for i in range(8):
-
             end_row = row + row_moves[i]
             end_col = col + col_moves[i]
-
-            if 0 <= end_row <= 7 and 0 <= end_col <= 7:
-                end_piece = self.board[end_row][end_col]
-                if end_piece[0] != ally:  # not an ally piece - empty or enemy
-
-                    if ally == "w":
-                        self.w_king_loc = (end_row, end_col)
-                    else:
-                        self.b_king_loc = (end_row, end_col)
-                    in_check, pins, checks = self.find_pins_checks()
-                    if not in_check:
-                        moves.append(Move((row, col), (end_row, end_col), self.board))
-                    if ally == "w":
-                        self.w_king_loc = (row, col)
-                    else:
-                        self.b_king_loc = (row, col)
-
-    def square_under_attack(self, row, col):
-
-        self.white_to_move = not self.white_to_move  # switch to opponent's point of view
-        opponents_moves = self.generate_possible_moves()
-        self.white_to_move = not self.white_to_move
-        for move in opponents_moves:
-            if move.end_row == row and move.end_col == col:  # square is under attack
+            if 0 <= end_row <= 7 and 0 <= end_col <= 7 and self.board[end_row][end_col][0] != ally:
+                targets.append((end_row, end_col))
+
+        enemy = "b" if ally == "w" else "w"
+        if len(targets) > map_threshold:  # one attack map for the position, seen through the king
+            attacked = self.attack_map(enemy, True)
+            for end_row, end_col in targets:
+                if not (attacked >> (end_row * 8 + end_col)) & 1:
+                    moves.append(base | (end_row * 8 + end_col) << 6 | piece_codes[self.board[end_row][end_col]] << 16)
+        elif targets:  # a hemmed in king is cheaper to check square by square
+            self.board[row][col] = "  "  # lift the king so it can't hide behind itself along a checking line
+            for end_row, end_col in targets:
+                if not self.attacked_by(end_row, end_col, enemy):
+                    moves.append(base | (end_row * 8 + end_col) << 6 | piece_codes[self.board[end_row][end_col]] << 16)
+            self.board[row][col] = ally + "K"
+
+    def square_under_attack(self, row, col):  # whether the side not to move attacks the square
+        return self.attacked_by(row, col, "b" if self.white_to_move else "w")
+
+    def attacked_by(self, row, col, color, board=None):  # board defaults to the current one
+        # work backwards from the square - look along each line and knight jump for a piece of the given color that
+        # could reach it, instead of generating every move the other side has
+        if board is None:
+            board = self.board
+        pawn_row = row + 1 if color == "w" else row - 1  # pawns attack towards the other side of the board
+        if 0 <= pawn_row <= 7:
+            for pawn_col in (col - 1, col + 1):
+                if 0 <= pawn_col <= 7 and board[pawn_row][pawn_col] == color + "P":
+                    return True
+        for d_row, d_col in knight_directions:
+            end_row, end_col = row + d_row, col + d_col
+            if 0 <= end_row <= 7 and 0 <= end_col <= 7 and board[end_row][end_col] == color + "N":
                 return True
+        for j in range(8):
+            d_row, d_col = line_directions[j]
+            slider = "R" if j < 4 else "B"
+            for i in range(1, 8):
+                end_row, end_col = row + d_row * i, col + d_col * i
+                if not (0 <= end_row <= 7 and 0 <= end_col <= 7):
+                    break
+                piece = board[end_row][end_col]
+                if piece != "  ":
+                    if piece[0] == color and (piece[1] == slider or piece[1] == "Q" or (i == 1 and piece[1] == "K")):
+                        return True
+                    break
         return False
 
+    def attack_map(self, color, x_ray=False):  # bitboard (bit row * 8 + col) of every square the given color attacks
+        # with x_ray the other side's king doesn't block lines - the squares behind it are where it can't step to
+        key = self.zobrist_key
+        cached = self.attack_cache.get((color, x_ray))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        board = self.board
+        see_through = ("b" if color == "w" else "w") + "K" if x_ray else None
+        attacks = 0
+        for row, col in self.piece_locs[color]:
+            piece = board[row][col]
+            if piece[1] == "P":
+                end_row = row - 1 if color == "w" else row + 1
+                for end_col in (col - 1, col + 1):
+                    if 0 <= end_row <= 7 and 0 <= end_col <= 7:
+                        attacks |= 1 << (end_row * 8 + end_col)
+            elif piece[1] == "N" or piece[1] == "K":
+                steps = knight_directions if piece[1] == "N" else line_directions
+                for d_row, d_col in steps:
+                    end_row, end_col = row + d_row, col + d_col
+                    if 0 <= end_row <= 7 and 0 <= end_col <= 7:
+                        attacks |= 1 << (end_row * 8 + end_col)
+            else:
+                lines = line_directions[:4] if piece[1] == "R" else line_directions[4:] if piece[1] == "B" \
+                    else line_directions
+                for d_row, d_col in lines:
+                    for i in range(1, 8):
+                        end_row, end_col = row + d_row * i, col + d_col * i
+                        if not (0 <= end_row <= 7 and 0 <= end_col <= 7):
+                            break
+                        attacks |= 1 << (end_row * 8 + end_col)
+                        if board[end_row][end_col] != "  " and board[end_row][end_col] != see_through:
+                            break
+
+        self.attack_cache[(color, x_ray)] = (key, attacks)
+        return attacks
+
     def get_castle_moves(self, row, col, moves):
         if self.inCheck:
             return
-        if (self.white_to_move and self.castle_rights.wks) or (not self.white_to_move and self.castle_rights.bks):
+        if self.castle_rights & (castle_wks if self.white_to_move else castle_bks):
             self.get_king_side(row, col, moves)
-        if (self.white_to_move and self.castle_rights.wqs) or (not self.white_to_move and self.castle_rights.bqs):
+        if self.castle_rights & (castle_wqs if self.white_to_move else castle_bqs):
             self.get_queen_side(row, col, moves)
 
     def get_king_side(self, row, col, moves):
         if self.board[row][col+1] == "  " and self.board[row][col+2] == "  ":
             if not self.square_under_attack(row, col+1) and not self.square_under_attack(row, col+2):
-                moves.append(Move((row, col), (row, col+2), self.board, castle=True))
+                moves.append(encode_move((row, col), (row, col+2), self.board, castle=True))
 
     def get_queen_side(self, row, col, moves):
-        if self.board[row][col-1] == "  " and self.board[row][col-2] == "  " and self.board[row][col-3]:
+        if self.board[row][col-1] == "  " and self.board[row][col-2] == "  " and \
+                self.board[row][col-3] == "  ":
             if not self.square_under_attack(row, col-1) and not self.square_under_attack(row, col-2):
-                moves.append(Move((row, col), (row, col-2), self.board, castle=True))
+                moves.append(encode_move((row, col), (row, col-2), self.board, castle=True))
 
-    def generate_valid_moves(self):
+    def generate_valid_moves(self):  # legal moves for the side to move - a fresh list the caller is free to reorder
+        return list(self.cached_moves())
+
+    def cached_moves(self):  # the legal move list for this position, only generated once per position
+        key = self.zobrist_key
+        if self.move_cache[0] != key:
+            self.move_cache = (key, self.generate_legal_moves(), self.inCheck)
+        else:
+            self.inCheck = self.move_cache[2]
+        return self.move_cache[1]
+
+    def has_legal_move(self):  # stops at the first legal move found, for when only mate or stalemate matters
+        key = self.zobrist_key
+        if self.move_cache[0] == key:
+            self.inCheck = self.move_cache[2]
+            return len(self.move_cache[1]) > 0
+
+        self.inCheck, self.pins, self.checks = self.find_pins_checks()
+        ally = "w" if self.white_to_move else "b"
+        king_row, king_col = self.w_king_loc if self.white_to_move else self.b_king_loc
+        moves = []
+        self.king_moves(king_row, king_col, moves)  # castling is never the only legal move, so it can be skipped
+        if moves:
+            return True
+
+        if len(self.checks) < 2:  # in double check only the king can move
+            valid_squares = self.check_squares(king_row, king_col) if self.inCheck else None
+            for row, col in self.piece_locs[ally]:
+                if self.board[row][col][1] != "K":
+                    self.move_funcs[self.board[row][col][1]](row, col, moves)
+                    for move in moves:
+                        if valid_squares is None or move & ep_flag or (move >> 6) & 63 in valid_squares:
+                            return True
+                    moves = []
+
+        self.move_cache = (key, [], self.inCheck)  # nothing legal, so that is the full move list too
+        return False
+
+    def check_squares(self, king_row, king_col):  # squares a non-king move can land on to stop a single check
+        check = self.checks[0]
+        valid_squares = set()  # as row * 8 + col, like the squares in a packed move
+
+        if self.board[check[0]][check[1]][1] == "N":  # forced to capture knight or move away
+            valid_squares.add(check[0] * 8 + check[1])
+        else:  # all other pieces can be blocked
+            for i in range(1, 8):
+                square = (king_row + check[2] * i, king_col + check[3] * i)
+                valid_squares.add(square[0] * 8 + square[1])
+                if square[0] == check[0] and square[1] == check[1]:
+                    break
+        return valid_squares
+
+    def staged_moves(self, hash_move=0, killers=(), capture_order=None, quiet_order=None, captures_only=False):
+        """
+        Yield moves a stage at a time - the hash move, captures and promotions, killers, then the remaining quiet
+        moves - so a search that cuts off early never generates the later stages. capture_order and quiet_order are
+        sort keys, best first. Moves are only pseudo legal: make each one and skip it if left_in_check().
+        """
+        if hash_move and self.is_pseudo_legal(hash_move):
+            yield hash_move
+        else:
+            hash_move = 0
+
+        moves = self.pseudo_legal_moves()
+        captures = [move for move in moves if ((move >> 16) & 15 or move & promotion_flag) and move != hash_move]
+        captures.sort(key=capture_order, reverse=True)
+        yield from captures
+        if captures_only:
+            return
+
+        tried = {hash_move}
+        for killer in killers:
+            if killer not in tried and not ((killer >> 16) & 15 or killer & promotion_flag) and \
+                    self.is_pseudo_legal(killer):
+                tried.add(killer)
+                yield killer
+
+        quiets = [move for move in moves if not ((move >> 16) & 15 or move & promotion_flag) and move not in tried]
+        quiets.sort(key=quiet_order, reverse=True)
+        yield from quiets
+
+    def pseudo_legal_moves(self):  # moves by the rules of movement alone - some may leave the king in check
+        self.pins = []  # so no piece is held back by a pin
+        self.inCheck = self.is_in_check()
+        moves = self.generate_possible_moves()
+        king_row, king_col = self.w_king_loc if self.white_to_move else self.b_king_loc
+        self.get_castle_moves(king_row, king_col, moves)
+        return moves
+
+    def is_pseudo_legal(self, move):  # whether a move from elsewhere in the tree (hash, killer) can be made here
+        start_row, start_col, end_row, end_col = (move >> 3) & 7, move & 7, (move >> 9) & 7, (move >> 6) & 7
+        piece_moved = pieces[(move >> 12) & 15]
+        if piece_moved[0] != ("w" if self.white_to_move else "b") or self.board[start_row][start_col] != piece_moved:
+            return False
+        if move & (castle_flag | ep_flag):  # rare enough to just check against the real thing
+            return move in self.cached_moves()
+        if self.board[end_row][end_col] != pieces[(move >> 16) & 15]:
+            return False
+        if bool(move & promotion_flag) != (piece_moved[1] == "P" and end_row in (0, 7)):
+            return False
+
+        d_row, d_col = end_row - start_row, end_col - start_col
+        kind = piece_moved[1]
+        if kind == "N":
+            return (abs(d_row), abs(d_col)) in ((1, 2), (2, 1))
+        if kind == "K":
+            return max(abs(d_row), abs(d_col)) == 1
+        if kind == "P":
+            direction = -1 if self.white_to_move else 1
+            if self.board[end_row][end_col] != "  ":
+                return d_row == direction and abs(d_col) == 1
+            return d_col == 0 and (d_row == direction or (d_row == 2 * direction and start_row == (6 if direction == -1
+                                   else 1) and self.board[start_row + direction][start_col] == "  "))
+        if (d_row and d_col and abs(d_row) != abs(d_col)) or (kind == "R" and d_row and d_col) or \
+                (kind == "B" and not (d_row and d_col)):
+            return False
+        step_row, step_col = (d_row > 0) - (d_row < 0), (d_col > 0) - (d_col < 0)
+        for i in range(1, max(abs(d_row), abs(d_col))):  # nothing in the way
+            if self.board[start_row + step_row * i][start_col + step_col * i] != "  ":
+                return False
+        return True
+
+    def is_in_check(self):  # whether the side to move is in check
+        row, col = self.w_king_loc if self.white_to_move else self.b_king_loc
+        return self.square_under_attack(row, col)
+
+    def left_in_check(self):  # after make_move - whether the side that just moved left its own king attacked
+        row, col = self.b_king_loc if self.white_to_move else self.w_king_loc
+        return self.attacked_by(row, col, "w" if self.white_to_move else "b")
+
+    def generate_legal_moves(self):  # uncached - use generate_valid_moves
 
-        temp_ep = self.can_ep
-        temp_castling = Castling(self.castle_rights.wks, self.castle_rights.wqs, self.castle_rights.bks,
-                                 self.castle_rights.bqs)
         moves = []
         self.inCheck, self.pins, self.checks = self.find_pins_checks()
 
@@ -381,22 +854,13 @@ class GameState:  # tracks the current state of the game
         if self.inCheck:
             if len(self.checks) == 1:
                 moves = self.generate_possible_moves()
-                check = self.checks[0]
-                piece_checking = self.board[check[0]][check[1]]
-                valid_squares = []
-
-                if piece_checking[1] == "N":  # forced to capture knight or move away
-                    valid_squares = [(check[0], check[1])]
-                else:  # all other pieces can be blocked
-                    for i in range(1, 8):
-                        square = (king_row + check[2] * i, king_col + check[3] * i)
-                        valid_squares.append(square)
-                        if square[0] == check[0] and square[1] == check[1]:
-                            break
+                valid_squares = self.check_squares(king_row, king_col)
+                king = piece_codes[self.board[king_row][king_col]]
                 for i in reversed(range(len(moves))):  # get rid of moves that don't block the check
-                    if moves[i].piece_moved[1] != "K":  # if it's not the king that is being moved...
-                        if (moves[i].end_row, moves[i].end_col) not in valid_squares:  # moves that don't block or take
-                            moves.remove(moves[i])
+                    # king moves and en passant captures have already been checked for safety
+                    if (moves[i] >> 12) & 15 != king and not moves[i] & ep_flag:
+                        if (moves[i] >> 6) & 63 not in valid_squares:  # moves that don't block or take
+                            del moves[i]
             else:  # there is more than one check so the king is forced to move
                 self.king_moves(king_row, king_col, moves)
 
@@ -407,8 +871,6 @@ class GameState:  # tracks the current state of the game
             else:
                 self.get_castle_moves(self.b_king_loc[0], self.b_king_loc[1], moves)
 
-        self.can_ep = temp_ep
-        self.castle_rights = temp_castling
         return moves
 
     def find_pins_checks(self):
@@ -482,29 +944,48 @@ class GameState:  # tracks the current state of the game
         return in_check, pins, checks
 
 
-class Move:
+class Move:  # decoded view of a packed move
+
+    __slots__ = ("moveID",)
+
+    def __init__(self, move):
+        self.moveID = move
 
-    def __init__(self, start, end, board, ep=False, castle=False):
+    @property
+    def start_row(self):
+        return (self.moveID >> 3) & 7
 
-        self.start_row = start[0]
-        self.start_col = start[1]
+    @property
+    def start_col(self):
+        return self.moveID & 7
 
-        self.end_row = end[0]
-        self.end_col = end[1]
+    @property
+    def end_row(self):
+        return (self.moveID >> 9) & 7
 
-        self.piece_moved = board[self.start_row][self.start_col]
-        self.piece_captured = board[self.end_row][self.end_col]
+    @property
+    def end_col(self):
+        return (self.moveID >> 6) & 7
 
-        self.moveID = self.start_row * 1000 + self.start_col * 100 + self.end_row * 10 + self.end_col
+    @property
+    def piece_moved(self):
+        return pieces[(self.moveID >> 12) & 15]
 
-        self.is_pawn_prom = (self.piece_moved == "wP" and self.end_row == 0) or \
-                            (self.piece_moved == "bP" and self.end_row == 7)
+    @property
+    def piece_captured(self):
+        return pieces[(self.moveID >> 16) & 15]
 
-        self.is_ep_move = ep
-        if self.is_ep_move:
-            self.piece_captured = "wP" if self.piece_moved[0] == "b" else "bP"
+    @property
+    def is_pawn_prom(self):
+        return bool(self.moveID & promotion_flag)
 
-        self.is_castle_move = castle
+    @property
+    def is_ep_move(self):
+        return bool(self.moveID & ep_flag)
+
+    @property
+    def is_castle_move(self):
+        return bool(self.moveID & castle_flag)
 
     # chess notation
     ranks_to_rows = {"1": 7, "2": 6, "3": 5, "4": 4, "5": 3, "6": 2, "7": 1, "8": 0}
@@ -526,18 +1007,16 @@ class Move:
             return self.piece_moved[1] + self.get_rank_file(self.start_row, self.start_col) + capture \
                + self.get_rank_file(self.end_row, self.end_col)
 
+    def uci(self):  # long algebraic, as other engines and tools read it - e7e8q for a promotion
+        return self.get_rank_file(self.start_row, self.start_col) + self.get_rank_file(self.end_row, self.end_col) \
+               + ("q" if self.is_pawn_prom else "")
+
     def get_rank_file(self, row, col):
         return self.cols_to_files[col] + self.rows_to_ranks[row]
 
-    def __eq__(self, other):
+    def __eq__(self, other):  # same start and end square, against another Move or a packed move
         if isinstance(other, Move):
-            return self.moveID == other.moveID
+            other = other.moveID
+        if isinstance(other, int):
+            return self.moveID & squares_mask == other & squares_mask
         return False
-
-
-class Castling:
-    def __init__(self, wks, wqs, bks, bqs):
-        self.wks = wks
-        self.bks = bks
-        self.wqs = wqs
-        self.bqs = bqs
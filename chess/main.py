@@ -7,7 +7,7 @@ Handles game state drawing and UI features: key handling, mouse handing, square
 
 import pygame as p
 from chess import engine, move_finder
-from multiprocessing import Process, Queue
+from chess.worker import EngineWorker
 
 
 # game window details
@@ -46,7 +46,7 @@ def main():
     white = False  # true if human is playing as white
     black = False
     move_undone = False
-    move_finder_process = None
+    worker = EngineWorker()  # searches in the background so the window stays responsive
     ai_thinking = False
 
     running = True  # Default running state
@@ -57,6 +57,7 @@ def main():
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+                worker.close()
                 p.quit()
             elif e.type == p.MOUSEBUTTONDOWN:
                 if not game_over and human:
@@ -72,7 +73,8 @@ def main():
                         player_selections.append(selected)
 
                     if len(player_selections) == 2:
-                        move = engine.Move(player_selections[0], player_selections[1], game_state.board)  # make move
+                        move = engine.Move(engine.encode_move(player_selections[0], player_selections[1],
+                                                              game_state.board))
 
                         for i in range(len(valid_moves)):
                             if move == valid_moves[i]:
@@ -91,7 +93,7 @@ def main():
                     move_made = True
                     game_over = False
                     if ai_thinking:
-                        move_finder_process.terminate()
+                        worker.stop()
                         ai_thinking = False
                     move_undone = True
                 if e.key == p.K_r:
@@ -103,20 +105,18 @@ def main():
                     to_animate = False
                     game_over = False
                     if ai_thinking:
-                        move_finder_process.terminate()
+                        worker.stop()
                         ai_thinking = False
                     move_undone = True
 
         if not game_over and not human and not move_undone:
             if not ai_thinking:
                 ai_thinking = True
-                return_queue = Queue()  # used to pass data between threads
-                move_finder_process = Process(target=move_finder.find_best_move, args=(game_state, valid_moves,
-                                                                                       return_queue))
-                move_finder_process.start()
+                worker.start_search(game_state.move_log)
 
-            if not move_finder_process.is_alive():
-                ai_move = return_queue.get()
+            result = worker.poll()
+            if result is not None:
+                ai_move = result.move
                 if ai_move is None:
                     ai_move = move_finder.find_random_moves(valid_moves)
                 game_state.make_move(ai_move)
@@ -127,7 +127,7 @@ def main():
         if move_made:
             if to_animate:
                 animate(game_state.move_log, display, game_state, clock, to_animate)
-                print(game_state.move_log[-1].chess_notation())
+                print(engine.Move(game_state.move_log[-1]).chess_notation())
             valid_moves = game_state.generate_valid_moves()
             move_made = False
             to_animate = False
@@ -201,7 +201,7 @@ def space_highlighting(display, game_state, valid_moves, selection):
         b = p.Surface((square_size, square_size))
         b.set_alpha(100)
         b.fill(p.Color(144, 238, 144))
-        sq = game_state.move_log[-1]
+        sq = engine.Move(game_state.move_log[-1])
         display.blit(b, (square_size * sq.start_col, square_size * sq.start_row))
 
     if selection != ():
@@ -214,14 +214,14 @@ def space_highlighting(display, game_state, valid_moves, selection):
             b = p.Surface((square_size, square_size))  # highlight squares of valid moves for that piece
             b.set_alpha(100)
             b.fill(p.Color(144, 238, 144))
-            for move in valid_moves:
+            for move in map(engine.Move, valid_moves):
                 if row == move.start_row and col == move.start_col:
                     display.blit(b, (square_size*move.end_col, square_size*move.end_row))
 
 
 def animate(move_log, display, board, clock, to_animate):
     if to_animate and len(move_log) != 0:
-        move = move_log[-1]
+        move = engine.Move(move_log[-1])
         delta_row = move.end_row - move.start_row
         delta_col = move.end_col - move.start_col
         frames = (abs(delta_row) + abs(delta_col)) * fps  # how many frames will it take to move to each square
@@ -1,135 +1,425 @@
 """
 move_finder.py
 
-AI move finder { will add more details later }
+AI move finder. find_best_move runs a nega max alpha beta search with iterative deepening: it searches to depth 1, 2,
+3, ... until the time budget for the move is spent, and answers with the best move of the deepest depth it finished.
+
+Passing workers to find_best_move_parallel searches the same position in several processes at once (lazy SMP). The
+processes share one transposition table in shared memory and search in slightly different orders, so each finds
+results the others can reuse. The deepest result any of them finishes is the answer.
 
 """
 
+import os
+import queue
 import random
+import time
+from multiprocessing import Event, Process, Queue
+from chess.book import OpeningBook
+from chess.engine import promotion_flag
+from chess.evaluation import piece_scores
+from chess.ordering import MoveOrderer, values
+from chess.tablebase import Tablebase
+from chess.transposition import TranspositionTable, exact, lower_bound, upper_bound
 
 
-piece_scores = {"K": 0, "Q": 10, "R": 5, "B": 3, "N": 3, "P": 1}
-
-knight_scores = [[0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0],
-                 [0.1, 0.3, 0.5, 0.5, 0.5, 0.5, 0.3, 0.1],
-                 [0.2, 0.5, 0.6, 0.65, 0.65, 0.6, 0.5, 0.2],
-                 [0.2, 0.55, 0.65, 0.7, 0.7, 0.65, 0.55, 0.2],
-                 [0.2, 0.5, 0.65, 0.7, 0.7, 0.65, 0.5, 0.2],
-                 [0.2, 0.55, 0.6, 0.65, 0.65, 0.6, 0.55, 0.2],
-                 [0.1, 0.3, 0.5, 0.55, 0.55, 0.5, 0.3, 0.1],
-                 [0.0, 0.1, 0.2, 0.2, 0.2, 0.2, 0.1, 0.0]]
-
-bishop_scores = [[0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0],
-                 [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
-                 [0.2, 0.4, 0.5, 0.6, 0.6, 0.5, 0.4, 0.2],
-                 [0.2, 0.5, 0.5, 0.6, 0.6, 0.5, 0.5, 0.2],
-                 [0.2, 0.4, 0.6, 0.6, 0.6, 0.6, 0.4, 0.2],
-                 [0.2, 0.6, 0.6, 0.6, 0.6, 0.6, 0.6, 0.2],
-                 [0.2, 0.5, 0.4, 0.4, 0.4, 0.4, 0.5, 0.2],
-                 [0.0, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.0]]
-
-rook_scores = [[0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25],
-               [0.5, 0.75, 0.75, 0.75, 0.75, 0.75, 0.75, 0.5],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.0, 0.25, 0.25, 0.25, 0.25, 0.25, 0.25, 0.0],
-               [0.25, 0.25, 0.25, 0.5, 0.5, 0.25, 0.25, 0.25]]
-
-queen_scores = [[0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0],
-                [0.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.2],
-                [0.2, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
-                [0.3, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
-                [0.4, 0.4, 0.5, 0.5, 0.5, 0.5, 0.4, 0.3],
-                [0.2, 0.5, 0.5, 0.5, 0.5, 0.5, 0.4, 0.2],
-                [0.2, 0.4, 0.5, 0.4, 0.4, 0.4, 0.4, 0.2],
-                [0.0, 0.2, 0.2, 0.3, 0.3, 0.2, 0.2, 0.0]]
-
-pawn_scores = [[0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8, 0.8],
-               [0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7, 0.7],
-               [0.3, 0.3, 0.4, 0.5, 0.5, 0.4, 0.3, 0.3],
-               [0.25, 0.25, 0.3, 0.45, 0.45, 0.3, 0.25, 0.25],
-               [0.2, 0.2, 0.2, 0.4, 0.4, 0.2, 0.2, 0.2],
-               [0.25, 0.15, 0.1, 0.2, 0.2, 0.1, 0.15, 0.25],
-               [0.25, 0.3, 0.3, 0.0, 0.0, 0.3, 0.3, 0.25],
-               [0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2, 0.2]]
-
-piece_position_scores = {"wN": knight_scores,
-                         "bN": knight_scores[::-1],
-                         "wB": bishop_scores,
-                         "bB": bishop_scores[::-1],
-                         "wQ": queen_scores,
-                         "bQ": queen_scores[::-1],
-                         "wR": rook_scores,
-                         "bR": rook_scores[::-1],
-                         "wP": pawn_scores,
-                         "bP": pawn_scores[::-1]}
-
 checkmate = 1000
 stalemate = 0
-D = 3
+D = 3  # default depth limit when searching without a clock
+max_depth = 64  # depth limit when searching against a clock
+move_time = 2.0  # default seconds per move
+moves_to_go = 30  # moves a game clock is assumed to still have to cover
+null_window = 0.001  # pawns - scores move in steps of 0.01, so any score above alpha fails high on this window
+time_check = 511  # look at the clock every time the node count passes a multiple of this plus one
+tt_size = 16  # transposition table size in MB
+helper_poll = 0.5  # seconds between checks that lazy SMP helpers are still alive while waiting for their results
+helper_grace = 5.0  # seconds a lazy SMP helper gets to stop before it is terminated
+book_file = os.path.join(os.path.dirname(__file__), "book.bin")  # build one with python -m chess.book build
+
+transposition_table = TranspositionTable(tt_size)
+move_orderer = MoveOrderer()
+opening_book = OpeningBook(book_file) if os.path.exists(book_file) else None
+endgame_tablebase = Tablebase()  # tables in chess/tablebases, built with python -m chess.tablebase build
+
+
+class SearchOptions:  # search features that can be switched off or tuned one at a time, for benchmarking
+
+    def __init__(self, quiescence_checks=True, delta_margin=2, pvs=True, aspiration_window=0.5, null_move=True,
+                 null_reduction=2, lmr=True, lmr_moves=3, lmr_pv_moves=6, lmr_depth=3, lmr_reduction=1):
+        self.quiescence_checks = quiescence_checks  # search every reply to a check in quiescence, no standing pat
+        self.delta_margin = delta_margin  # pawns - quiescence skips captures that can't get within this of alpha
+        self.pvs = pvs  # principal variation search - null window searches for every move after the first
+        self.aspiration_window = aspiration_window  # pawns either side of the last depth's score, 0 to turn off
+        self.null_move = null_move  # let the opponent move twice - if we are still above beta, cut off
+        self.null_reduction = null_reduction  # plies less to search the null move to
+        self.lmr = lmr  # late move reductions - search quiet moves late in the ordering less deeply
+        self.lmr_moves = lmr_moves  # moves searched at full depth before reductions start
+        self.lmr_pv_moves = lmr_pv_moves  # the same on the principal variation, where a wrong reduction costs most
+        self.lmr_depth = lmr_depth  # depth a node needs before its moves get reduced
+        self.lmr_reduction = lmr_reduction  # plies to reduce by
+
+
+default_options = SearchOptions()
+
+
+class SearchResult:  # what find_best_move hands back - the move from the deepest depth that was searched completely
+
+    def __init__(self, move=None, score=0, depth=0, nodes=0, elapsed=0.0):
+        self.move = move  # packed move, or None if there was nothing to search
+        self.score = score  # from the point of view of the side to move, in pawns
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed  # seconds
+
+    def __repr__(self):
+        return "SearchResult(move=%r, score=%r, depth=%d, nodes=%d, elapsed=%.3f)" % \
+               (self.move, self.score, self.depth, self.nodes, self.elapsed)
+
+
+class Search:  # bookkeeping for one find_best_move call, passed down the recursion
+
+    def __init__(self, deadline=None, orderer=move_orderer, options=default_options, table=transposition_table,
+                 stop_event=None, max_nodes=None):
+        self.deadline = deadline  # time.perf_counter() value to stop at, None to search without a clock
+        self.max_nodes = max_nodes  # None for no node limit - checked with the clock, so it can overrun a little
+        self.orderer = orderer  # see chess/ordering.py
+        self.options = options
+        self.table = table
+        self.stop_event = stop_event  # multiprocessing.Event another process can set to end the search early
+        self.nodes = 0
+        self.stopped = False  # set once the deadline passes - every score after that is meaningless
+        self.best_move = 0  # best root move found so far at the depth being searched
+
+    def out_of_time(self):
+        self.nodes += 1
+        if not self.nodes & time_check:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                self.stopped = True
+            elif self.stop_event is not None and self.stop_event.is_set():
+                self.stopped = True
+            elif self.max_nodes is not None and self.nodes >= self.max_nodes:
+                self.stopped = True
+        return self.stopped
 
 
-def find_move_nega_max(game_state, valid_moves, depth, alpha, beta, turn_multiplier):
-    global next_move
-    if depth == 0:
-        return turn_multiplier * score_board(game_state)
-    # move ordering - implement later //TODO
+def find_move_nega_max(game_state, valid_moves, depth, ply, alpha, beta, turn_multiplier, search, pv=True,
+                       null_ok=True):
+    # pv is whether this node is on the principal variation - the first move of every pv node, and any move a pv node
+    # has to search again with its full window. Null move is only tried off it, and reductions start later on it
+    if search.out_of_time():
+        return 0
+
+    # probe the transposition table - a deep enough stored result can end the search here, except at the root where
+    # we still need a move
+    key = game_state.zobrist_key
+    alpha_orig = alpha
+    entry = search.table.probe(key)
+    hash_move = 0
+    if entry is not None:
+        tt_depth, tt_score, tt_bound, hash_move = entry
+        if tt_depth >= depth and ply != 0:
+            if tt_bound == exact:
+                return tt_score
+            elif tt_bound == lower_bound:
+                alpha = max(alpha, tt_score)
+            else:
+                beta = min(beta, tt_score)
+            if alpha >= beta:
+                return tt_score
+
+    if depth <= 0:  # horizon - play out the captures before trusting the evaluation
+        score = quiescence(game_state, ply, alpha, beta, turn_multiplier, search)
+        if not search.stopped:
+            search.table.store(key, 0, score, bound_type(score, alpha_orig, beta), 0)
+        return score
+
+    options = search.options
+    in_check = game_state.is_in_check()
+
+    # null move pruning - if passing the turn still leaves us at or above beta, a real move will too. Not tried in
+    # check, on the principal variation, twice in a row, or with only pawns left, where passing may be the best move
+    if (options.null_move and null_ok and not pv and not in_check and depth > options.null_reduction
+            and abs(beta) < checkmate and game_state.has_pieces("w" if game_state.white_to_move else "b")
+            and turn_multiplier * static_score(game_state) >= beta):
+        game_state.make_null_move()
+        score = -find_move_nega_max(game_state, None, depth - 1 - options.null_reduction, ply + 1, -beta,
+                                    -beta + null_window, -turn_multiplier, search, False, False)
+        game_state.undo_null_move()
+        if search.stopped:
+            return 0
+        if score >= beta:
+            return beta if score >= checkmate else score  # a mate found after passing proves nothing
+
+    # the root is given its legal moves, everywhere else they come a stage at a time and only as far as needed
+    orderer = search.orderer
+    if valid_moves is not None:
+        moves = orderer.order(valid_moves, hash_move, ply)
+    else:
+        moves = game_state.staged_moves(hash_move, orderer.killers_at(ply), orderer.capture_score,
+                                        orderer.quiet_score)
+
     max_score = -checkmate
-    for move in valid_moves:
+    best_move = 0
+    i = 0  # legal moves searched so far
+    for move in moves:
         game_state.make_move(move)
-        next_moves = game_state.generate_valid_moves()
-        score = -find_move_nega_max(game_state, next_moves, depth - 1, -beta, -alpha, -turn_multiplier)
-        if score > max_score:
-            max_score = score
-            if depth == D:
-                next_move = move
+        if game_state.left_in_check():
+            game_state.undo_move()
+            continue
+        if i == 0:
+            score = -find_move_nega_max(game_state, None, depth - 1, ply + 1, -beta, -alpha, -turn_multiplier, search,
+                                        pv)
+        else:
+            # late move reductions - quiet moves this far down the ordering rarely turn out best, so search them
+            # shallower first and only at full depth if they beat alpha
+            reduction = 0
+            late = options.lmr_pv_moves if pv else options.lmr_moves
+            if (options.lmr and i >= late and depth >= options.lmr_depth and not in_check
+                    and not (move >> 16) & 15 and not move & promotion_flag):
+                reduction = options.lmr_reduction
+            # with pvs, only try to prove the move is no better than the best so far, and search it properly if it is
+            window = -alpha - null_window if options.pvs else -beta
+            score = -find_move_nega_max(game_state, None, depth - 1 - reduction, ply + 1, window, -alpha,
+                                        -turn_multiplier, search, False)
+            if reduction and score > alpha and not search.stopped:
+                score = -find_move_nega_max(game_state, None, depth - 1, ply + 1, window, -alpha, -turn_multiplier,
+                                            search, False)
+            if options.pvs and alpha < score < beta and not search.stopped:
+                score = -find_move_nega_max(game_state, None, depth - 1, ply + 1, -beta, -alpha, -turn_multiplier,
+                                            search, pv)
         game_state.undo_move()
+        i += 1
+        if search.stopped:  # the score of an unfinished subtree can't be trusted, so don't keep or store it
+            return 0
+        if score > max_score or not best_move:  # even a lost position needs a move to play
+            max_score = score
+            best_move = move
+            if ply == 0:
+                search.best_move = move
         if max_score > alpha:
             alpha = max_score
         if alpha >= beta:
+            orderer.cutoff(move, depth, ply)
             break
+
+    if i == 0:
+        return -checkmate if in_check else stalemate
+    search.table.store(key, depth, max_score, bound_type(max_score, alpha_orig, beta), best_move)
     return max_score
 
 
+def quiescence(game_state, ply, alpha, beta, turn_multiplier, search):  # captures only, until the position is quiet
+    if search.out_of_time():
+        return 0
+
+    # no mate or stalemate detection here unless in check - that would need every move generated
+    in_check = search.options.quiescence_checks and game_state.is_in_check()
+    if in_check:  # standing pat isn't an option when in check - every evasion gets searched
+        max_score = stand_pat = -checkmate
+    else:  # the side to move can always decline to capture, so the static score is a lower bound
+        max_score = stand_pat = turn_multiplier * static_score(game_state)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+    orderer = search.orderer
+    for move in game_state.staged_moves(0, (), orderer.capture_score, orderer.quiet_score, not in_check):
+        if not in_check:  # delta pruning - even winning the piece outright wouldn't get near alpha
+            gain = values[(move >> 16) & 15] + (piece_scores["Q"] - piece_scores["P"] if move & promotion_flag else 0)
+            if stand_pat + gain + search.options.delta_margin <= alpha:
+                continue
+        game_state.make_move(move)
+        if game_state.left_in_check():
+            game_state.undo_move()
+            continue
+        score = -quiescence(game_state, ply + 1, -beta, -alpha, -turn_multiplier, search)
+        game_state.undo_move()
+        if search.stopped:
+            return 0
+        if score > max_score:
+            max_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return max_score
+
+
+def bound_type(score, alpha, beta):  # how a score searched with the window (alpha, beta) is stored
+    if score <= alpha:
+        return upper_bound
+    elif score >= beta:
+        return lower_bound
+    return exact
+
+
 def score_board(game_state):
     """
     Score the board. A positive score is good for white, a negative score is good for black.
     """
-    if game_state.is_checkmate():
-        if game_state.white_to_move:
+    if not game_state.has_legal_move():  # one partial generation covers both mate and stalemate
+        if not game_state.inCheck:
+            return stalemate
+        elif game_state.white_to_move:
             return -checkmate  # black wins
         else:
             return checkmate  # white wins
-    elif game_state.is_stalemate():
-        return stalemate
-    score = 0
-    for row in range(len(game_state.board)):
-        for col in range(len(game_state.board[row])):
-            piece = game_state.board[row][col]
-            if piece != "  ":
-                piece_position_score = 0
-                if piece[1] != "K":
-                    piece_position_score = piece_position_scores[piece][row][col]
-                if piece[0] == "w":
-                    score += piece_scores[piece[1]] + piece_position_score
-                if piece[0] == "b":
-                    score -= piece_scores[piece[1]] + piece_position_score
+    return static_score(game_state)
+
 
-    return score
+def static_score(game_state):  # material and piece squares only, white positive - no check for mate or stalemate
+    return (game_state.material_score + game_state.position_score) / 100  # kept up to date by make_move, in centipawns
 
 
 def find_random_moves(valid_moves):
     return valid_moves[random.randint(0, len(valid_moves)-1)]
 
 
-def find_best_move(game_state, valid_moves, return_queue):
-    global next_move
-    next_move = None
-    random.shuffle(valid_moves)
-    find_move_nega_max(game_state, valid_moves, D, -checkmate, checkmate, 1 if game_state.white_to_move else -1)
-    return_queue.put(next_move)
+def time_budget(seconds=None, time_left=None, increment=0):  # seconds to spend on this move, None for no limit
+    if time_left is not None:  # game clock - spread what is left over the moves still to play
+        return min(time_left / moves_to_go + increment, time_left / 2)
+    return seconds
+
+
+def known_move(game_state, valid_moves, book, tablebase):  # SearchResult at depth 0 when no search is needed, or None
+    answer = tablebase.best_move(game_state, valid_moves) if tablebase is not None else None
+    if answer is not None:  # perfect play from the endgame tables
+        move, value = answer
+        return SearchResult(move, checkmate if value > 0 else -checkmate if value < 0 else stalemate)
+    move = book.choose(game_state, valid_moves) if book is not None else None
+    if move is not None:
+        return SearchResult(move)
+    return None
+
+
+def find_best_move(game_state, valid_moves, return_queue=None, seconds=move_time, time_left=None, increment=0,
+                   depth=None, orderer=move_orderer, options=default_options, table=transposition_table,
+                   stop_event=None, start_depth=1, nodes=None, book=opening_book, tablebase=endgame_tablebase):
+    """
+    Search with iterative deepening and return a SearchResult, also putting it on return_queue if one is given.
+    seconds is a fixed time per move. Passing time_left (and increment) instead budgets from a game clock. nodes
+    caps the nodes searched, which unlike a clock gives the same answer on any machine. With none of these the search
+    runs to depth, which defaults to D. Endgames in tablebase and positions in book are answered without searching.
+    """
+    start = time.perf_counter()
+    result = known_move(game_state, valid_moves, book, tablebase)
+    if result is not None:
+        result.elapsed = time.perf_counter() - start
+        if return_queue is not None:
+            return_queue.put(result)
+        return result
+    budget = time_budget(seconds, time_left, increment)
+    if depth is None:
+        depth = D if budget is None and nodes is None else max_depth
+    search = Search(None if budget is None else start + budget, orderer, options, table, stop_event, nodes)
+    result = SearchResult()
+    random.shuffle(valid_moves)  # variety between games - ordering only moves a shuffled move if it looks better
+    table.new_search()
+    orderer.new_search()
+    turn_multiplier = 1 if game_state.white_to_move else -1
+
+    for current_depth in range(min(start_depth, depth), depth + 1):
+        if not valid_moves:
+            break
+        alpha, beta = -checkmate, checkmate
+        if options.aspiration_window and result.move is not None:  # the score rarely moves far between depths
+            alpha, beta = result.score - options.aspiration_window, result.score + options.aspiration_window
+        score = find_move_nega_max(game_state, valid_moves, current_depth, 0, alpha, beta, turn_multiplier, search)
+        if not search.stopped and (score <= alpha or score >= beta) and (alpha, beta) != (-checkmate, checkmate):
+            score = find_move_nega_max(game_state, valid_moves, current_depth, 0, -checkmate, checkmate,
+                                       turn_multiplier, search)  # fell outside the window - search again in full
+        elapsed = time.perf_counter() - start
+        if search.stopped:
+            if result.move is None and search.best_move:  # better a move from a partial search than none
+                result.move = search.best_move
+            break
+        result = SearchResult(search.best_move, score, current_depth, search.nodes, elapsed)
+        if abs(score) >= checkmate:  # forced mate one way or the other, deeper searches won't change the move
+            break
+        if budget is not None and elapsed > budget / 2:  # the next depth takes several times longer - don't start it
+            break
+
+    result.nodes, result.elapsed = search.nodes, time.perf_counter() - start
+    if return_queue is not None:
+        return_queue.put(result)
+    return result
+
+
+def find_best_move_parallel(game_state, valid_moves, return_queue=None, workers=None, seconds=move_time,
+                            time_left=None, increment=0, depth=None, options=default_options, book=opening_book,
+                            tablebase=endgame_tablebase):
+    """
+    Lazy SMP version of find_best_move: this process and workers - 1 helper processes all search the position,
+    sharing a transposition table. Returns the deepest result, with nodes summed over every process.
+    """
+    start = time.perf_counter()
+    result = known_move(game_state, valid_moves, book, tablebase)
+    if result is not None:  # no search, so no helpers either
+        result.elapsed = time.perf_counter() - start
+        if return_queue is not None:
+            return_queue.put(result)
+        return result
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:  # book and tablebase already missed, no need to probe them again
+        return find_best_move(game_state, valid_moves, return_queue, seconds, time_left, increment, depth,
+                              options=options, book=None, tablebase=None)
+
+    table = TranspositionTable(tt_size, shared=True)
+    stop_event, results = Event(), Queue()
+    position = game_state.to_bytes()  # a few dozen bytes instead of a pickled GameState and its whole history
+    helpers = [Process(target=lazy_smp_helper, args=(index, table.name, type(game_state), position, results,
+                                                     stop_event, seconds, time_left, increment, depth, options))
+               for index in range(1, workers)]
+    for helper in helpers:
+        helper.start()
+    try:
+        result = find_best_move(game_state, valid_moves, None, seconds, time_left, increment, depth,
+                                MoveOrderer(), options, table, stop_event, book=None, tablebase=None)
+        stop_event.set()  # the helpers only matter for what they add to the table while this search runs
+        nodes = result.nodes
+        received = 0
+        while received < len(helpers):
+            try:
+                helper_result = results.get(timeout=helper_poll)
+            except queue.Empty:
+                if not any(helper.is_alive() for helper in helpers):  # one died without answering
+                    break
+                continue
+            received += 1
+            nodes += helper_result.nodes
+            if helper_result.depth > result.depth and helper_result.move is not None:
+                result = helper_result
+        result.nodes = nodes
+    finally:
+        stop_event.set()
+        for helper in helpers:
+            helper.join(helper_grace)
+            if helper.is_alive():
+                helper.terminate()
+                helper.join()
+        table.close()
+
+    if return_queue is not None:
+        return_queue.put(result)
+    return result
+
+
+def lazy_smp_helper(index, table_name, state_class, position, results, stop_event, seconds, time_left, increment,
+                    depth, options):
+    # every helper shuffles differently and every other one skips depth 1, so they don't all search the same tree
+    random.seed(index)
+    result = SearchResult()  # what the parent gets if anything below fails, so it never waits for an answer forever
+    try:
+        game_state = state_class.from_bytes(position)
+        table = TranspositionTable(tt_size, name=table_name)
+        try:
+            result = find_best_move(game_state, game_state.generate_valid_moves(), None, seconds, time_left,
+                                    increment, depth, MoveOrderer(), options, table, stop_event, 1 + index % 2,
+                                    book=None, tablebase=None)
+        finally:
+            table.close()
+    finally:
+        results.put(result)
 
 
 def find_best_move_old(game_state, valid_moves):
@@ -0,0 +1,75 @@
+"""
+ordering.py
+
+Move ordering for the move finder. Alpha beta only cuts off quickly when the best move is searched first, so moves are
+sorted by how likely they are to be good: the transposition table's move, then captures by most valuable victim and
+least valuable attacker, then killer moves (quiet moves that caused a cutoff at the same ply elsewhere in the tree),
+then the rest by how often they have caused cutoffs so far (history heuristic).
+
+A search can use any object with the same methods. order sorts a whole list at once, for the root. Below the root
+the search takes moves a stage at a time from GameState.staged_moves, sorted by capture_score and quiet_score.
+
+"""
+
+from chess.engine import pieces, promotion_flag
+from chess.evaluation import piece_scores
+
+
+hash_score = 1 << 30
+capture_score = 1 << 20  # captures and promotions - always above killers and history
+max_history = 1 << 16  # history scores are halved once one passes this, so recent cutoffs weigh more
+max_ply = 128
+
+values = [0] + [piece_scores[piece[1]] for piece in pieces[1:]]  # by piece code, as packed into a move
+
+
+class MoveOrderer:
+
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(max_ply)]  # two most recent quiet cutoff moves at each ply
+        self.history = [0] * (1 << 16)  # by the start square, end square and piece bits of a move
+
+    def new_search(self):  # killers are position specific, history is still a fair guide for the next move
+        self.killers = [[0, 0] for _ in range(max_ply)]
+        self.history = [score >> 2 for score in self.history]
+
+    def order(self, moves, hash_move=0, ply=0):  # sorts moves in place, best first, and returns them
+        killer_1, killer_2 = self.killers_at(ply)
+        history = self.history
+
+        def score(move):
+            if move == hash_move:
+                return hash_score
+            if (move >> 16) & 15 or move & promotion_flag:
+                return capture_score + self.capture_score(move)
+            if move == killer_1:
+                return capture_score - 1
+            if move == killer_2:
+                return capture_score - 2
+            return history[move & 0xFFFF]
+
+        moves.sort(key=score, reverse=True)  # stable, so ties keep whatever order they came in
+        return moves
+
+    def capture_score(self, move):  # most valuable victim first, then least valuable attacker
+        promotion = piece_scores["Q"] * 100 if move & promotion_flag else 0
+        return values[(move >> 16) & 15] * 100 + promotion - values[(move >> 12) & 15]
+
+    def quiet_score(self, move):
+        return self.history[move & 0xFFFF]
+
+    def killers_at(self, ply):
+        return self.killers[ply] if ply < max_ply else (0, 0)
+
+    def cutoff(self, move, depth, ply):  # move failed high - quiet moves become killers and gain history
+        if (move >> 16) & 15 or move & promotion_flag:  # captures already sort first
+            return
+        if ply < max_ply:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        index = move & 0xFFFF
+        self.history[index] += depth * depth
+        if self.history[index] > max_history:
+            self.history = [score >> 1 for score in self.history]
@@ -0,0 +1,104 @@
+"""
+perft.py
+
+Perft (performance test) for the move generator: counts every leaf of the legal move tree to a fixed depth and checks
+the totals against known-correct numbers for a set of standard positions. Also reports nodes per second, so it doubles
+as a move generation benchmark.
+
+Run from the repository root:
+    python -m chess.perft                      # whole suite to depth 3
+    python -m chess.perft --depth 4 --bitboard  # deeper, on BitboardState
+    python -m chess.perft --divide 2 --fen "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -"
+
+"""
+
+import argparse
+import sys
+import time
+
+from chess import engine, bitboard
+
+
+# the engine always promotes to a queen, so every count here is at a depth where no promotions are possible yet
+positions = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - -",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+]
+
+
+def load_fen(fen, state_class=engine.GameState):
+    return state_class.from_fen(fen)
+
+
+def perft(game_state, depth):  # number of leaf nodes of the legal move tree
+    moves = game_state.generate_valid_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        game_state.make_move(move)
+        nodes += perft(game_state, depth - 1)
+        game_state.undo_move()
+    return nodes
+
+
+def divide(game_state, depth):  # perft split by root move, for tracking down which move a wrong count comes from
+    counts = {}
+    for move in game_state.generate_valid_moves():
+        game_state.make_move(move)
+        view = engine.Move(move)
+        counts[view.get_rank_file(view.start_row, view.start_col) + view.get_rank_file(view.end_row, view.end_col)] = \
+            perft(game_state, depth - 1)
+        game_state.undo_move()
+    return counts
+
+
+def run_suite(max_depth=3, state_class=engine.GameState):  # returns the names of the positions that miscounted
+    failures = []
+    for name, fen, expected in positions:
+        for depth in sorted(expected):
+            if depth > max_depth:
+                break
+            game_state = load_fen(fen, state_class)
+            start = time.perf_counter()
+            nodes = perft(game_state, depth)
+            elapsed = time.perf_counter() - start
+            result = "ok" if nodes == expected[depth] else "FAIL, expected " + str(expected[depth])
+            print("%-10s depth %d %10d nodes %8.2fs %9.0f nps  %s" %
+                  (name, depth, nodes, elapsed, nodes / max(elapsed, 1e-9), result))
+            if nodes != expected[depth]:
+                failures.append((name, depth))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count and time legal move tree leaves.")
+    parser.add_argument("--depth", type=int, default=3, help="deepest depth to run the suite to")
+    parser.add_argument("--bitboard", action="store_true", help="use BitboardState instead of GameState")
+    parser.add_argument("--divide", type=int, metavar="DEPTH", help="print per-move counts for --fen at this depth")
+    parser.add_argument("--fen", default=positions[0][1], help="position for --divide")
+    args = parser.parse_args()
+    state_class = bitboard.BitboardState if args.bitboard else engine.GameState
+
+    if args.divide:
+        counts = divide(load_fen(args.fen, state_class), args.divide)
+        for move in sorted(counts):
+            print(move, counts[move])
+        print("total", sum(counts.values()))
+        return 0
+
+    failures = run_suite(args.depth, state_class)
+    if failures:
+        print("perft failed for", ", ".join(name + " depth " + str(depth) for name, depth in failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
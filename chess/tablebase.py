@@ -0,0 +1,426 @@
+"""
+tablebase.py
+
+Endgame tablebases generated locally. For every position of a pawnless ending with up to four pieces, a table holds
+the distance to mate with perfect play, worked out backwards from the checkmates (retrograde analysis). With a table
+on disk find_best_move answers instantly and perfectly instead of searching positions it could never see to the end.
+
+A table is named by its material, stronger side first, white's pieces then black's: KQK, KRK, KQKR, KBNK and so on.
+Positions where black has the stronger pieces are looked up with the colors swapped and the board mirrored. Each
+position is stored once for all eight reflections and rotations of the board, using the one that puts the white king
+in the a1-d1-d4 triangle. The file is two halves of one signed byte per position, white to move then black to move:
+0 for a draw (or a position that can't happen), otherwise the plies to mate plus one, negative when the side to move
+is getting mated. Tables are memory mapped when probed, so only the pages that get looked at are read.
+
+Generate tables from the repository root (4 man tables take a few minutes each, the tables they depend on are
+generated first):
+    python -m chess.tablebase build                    # every 3 man table
+    python -m chess.tablebase build KQKR KRKB KBNK
+    python -m chess.tablebase probe --fen "8/8/8/4k3/8/8/8/KQ6 w - -"
+
+The fifty move rule is not taken into account.
+
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from array import array
+from itertools import product
+
+from chess import engine
+
+
+tablebase_dir = os.path.join(os.path.dirname(__file__), "tablebases")
+max_pieces = 4
+piece_order = "KQRBN"  # order of the pieces of a side within a table name, strongest first
+
+# board symmetry - the eight ways to reflect and rotate a square, by (row, col) -> (row, col)
+transforms = [[(row if t & 1 else 7 - row) * 8 + (col if t & 2 else 7 - col) if t < 4 else
+               (col if t & 1 else 7 - col) * 8 + (row if t & 2 else 7 - row)
+               for row in range(8) for col in range(8)] for t in range(8)]
+triangle = [row * 8 + col for row in (7, 6, 5, 4) for col in range(4) if 7 - row <= col]  # a1-d1-d4, 10 squares
+triangle_index = {square: index for index, square in enumerate(triangle)}
+# transforms that put the white king in the triangle - two for the a1-d4 diagonal, where the diagonal flip is free
+triangle_transforms = [[t for t in range(8) if transforms[t][square] in triangle_index] for square in range(64)]
+
+
+def rays_from(square, steps, slide):
+    row, col = divmod(square, 8)
+    rays = []
+    for row_step, col_step in steps:
+        ray, end_row, end_col = [], row + row_step, col + col_step
+        while 0 <= end_row < 8 and 0 <= end_col < 8:
+            ray.append(end_row * 8 + end_col)
+            if not slide:
+                break
+            end_row, end_col = end_row + row_step, end_col + col_step
+        if ray:
+            rays.append(ray)
+    return rays
+
+
+straight = ((-1, 0), (1, 0), (0, -1), (0, 1))
+diagonal = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+knight = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+rays = {"K": [rays_from(square, straight + diagonal, False) for square in range(64)],
+        "Q": [rays_from(square, straight + diagonal, True) for square in range(64)],
+        "R": [rays_from(square, straight, True) for square in range(64)],
+        "B": [rays_from(square, diagonal, True) for square in range(64)],
+        "N": [rays_from(square, knight, False) for square in range(64)]}
+# squares each piece attacks on an empty board as a bitmask, and the squares strictly between two squares on a line
+reach = {kind: [sum(1 << end for ray in rays[kind][square] for end in ray) for square in range(64)] for kind in rays}
+between = [[0] * 64 for _ in range(64)]
+for start in range(64):
+    for ray in rays["Q"][start]:
+        for index, end in enumerate(ray):
+            between[start][end] = sum(1 << square for square in ray[:index])
+
+
+def attacks(kind, start, end, occupied):  # does a piece of this kind on start attack end, given the occupied squares
+    return reach[kind][start] >> end & 1 and (kind in "KN" or not between[start][end] & occupied)
+
+
+def table_name(white, black):  # (name, flipped) for the table holding white's pieces against black's
+    def strength(side):
+        return len(side), [-piece_order.index(piece) for piece in side]
+    if strength(black) > strength(white):
+        return black + white, True
+    return white + black, False
+
+
+class Material:  # where each piece of one table goes in its positions and how positions are numbered
+
+    def __init__(self, name):
+        split = name.index("K", 1)
+        self.name = name
+        self.kinds = name
+        self.sides = [0] * split + [1] * (len(name) - split)  # 0 for white pieces, 1 for black
+        self.kings = (0, split)
+        self.count = len(name)
+        self.size = len(triangle) * 64 ** (self.count - 1)  # positions per side to move
+        # identical pieces of the same side are sorted by square, so swapping them gives the same position
+        self.groups = [(start, start + 2) for start in range(1, self.count - 1)
+                       if name[start] == name[start + 1] and self.sides[start] == self.sides[start + 1]]
+
+    def index(self, squares):  # number of a position, squares in table order - the same for all its reflections
+        best = None
+        for t in triangle_transforms[squares[0]]:
+            transform = transforms[t]
+            mapped = [transform[square] for square in squares]
+            for start, end in self.groups:
+                if mapped[start] > mapped[start + 1]:
+                    mapped[start], mapped[start + 1] = mapped[start + 1], mapped[start]
+            index = triangle_index[mapped[0]]
+            for square in mapped[1:]:
+                index = index * 64 + square
+            if best is None or index < best:
+                best = index
+        return best
+
+    def squares(self, index):
+        squares = []
+        for _ in range(self.count - 1):
+            index, square = divmod(index, 64)
+            squares.append(square)
+        squares.append(triangle[index])
+        squares.reverse()
+        return squares
+
+
+def signed(value):  # tables are read as unsigned bytes
+    return value - 256 if value > 127 else value
+
+
+def in_check(material, squares, side, occupied):  # is side's king attacked - captured pieces have square -1
+    king = squares[material.kings[side]]
+    return any(material.sides[piece] != side and squares[piece] >= 0 and
+               attacks(material.kinds[piece], squares[piece], king, occupied) for piece in range(material.count))
+
+
+def generate(name, directory=tablebase_dir, log=print):
+    """
+    Work out the table for one material and write it to directory, generating any table it depends on first (the
+    endings left after a capture). Returns the table as two arrays of signed bytes, white to move and black to move.
+    """
+    material = Material(name)
+    count, size, kinds, sides = material.count, material.size, material.kinds, material.sides
+    os.makedirs(directory, exist_ok=True)
+
+    # tables reached by capturing each piece: (values, material, flipped, pieces kept in the new table's order)
+    captures = {}
+    for victim in range(count):
+        if kinds[victim] == "K":
+            continue
+        kept = [piece for piece in range(count) if piece != victim]
+        white = "".join(kinds[piece] for piece in kept if not sides[piece])
+        black = "".join(kinds[piece] for piece in kept if sides[piece])
+        sub_name, flipped = table_name(white, black)
+        if sub_name == "KK":
+            captures[victim] = None  # bare kings, a draw
+            continue
+        if flipped:  # the new table's white pieces are our black ones
+            kept = [piece for piece in kept if sides[piece]] + [piece for piece in kept if not sides[piece]]
+        path = os.path.join(directory, sub_name + ".bin")
+        if not os.path.exists(path):
+            generate(sub_name, directory, log)
+        with open(path, "rb") as table:
+            values = table.read()
+        captures[victim] = (values, Material(sub_name), flipped, kept)
+
+    start = time.perf_counter()
+    values = (array("b", bytes(size)), array("b", bytes(size)))
+    unsolved = (bytearray(size), bytearray(size))  # moves to positions in this table not yet known to be won
+    states = (bytearray(size), bytearray(size))  # 1 for positions that can't happen, 2 for ones that can't be lost
+    capture_losses = (bytearray(size), bytearray(size))  # plies to mate after the longest losing capture
+    wins, losses = {}, {}  # plies -> positions (side * size + index) found to be won or lost in that many plies
+    illegal, safe = 1, 2
+
+    # first pass: every position forwards once, counting its moves and settling its captures
+    for index, squares in enumerate(product(triangle, *[range(64)] * (count - 1))):
+        if len(set(squares)) < count or material.index(squares) != index:  # pieces on one square, or a reflection
+            states[0][index] = states[1][index] = illegal
+            continue
+        occupied = sum(1 << square for square in squares)
+        for side in (0, 1):
+            if in_check(material, squares, 1 - side, occupied):  # the side that just moved left its king in check
+                states[side][index] = illegal
+                continue
+            successors, moves, best_capture, worst_capture, drawn = set(), 0, None, 0, False
+            for piece in range(count):
+                if sides[piece] != side:
+                    continue
+                for ray in rays[kinds[piece]][squares[piece]]:
+                    for end in ray:
+                        victim = -1
+                        if occupied >> end & 1:
+                            victim = squares.index(end)
+                            if sides[victim] == side:
+                                break
+                        after = list(squares)
+                        after[piece] = end
+                        after_occupied = occupied & ~(1 << squares[piece]) | 1 << end
+                        if victim < 0:
+                            if not in_check(material, after, side, after_occupied):
+                                moves += 1
+                                successors.add(material.index(after))
+                            continue
+                        after[victim] = -1
+                        if in_check(material, after, side, after_occupied):
+                            break
+                        moves += 1
+                        capture = captures[victim]
+                        if capture is None:
+                            drawn = True
+                            break
+                        sub_values, sub_material, flipped, kept = capture
+                        sub_squares = [after[piece] ^ 56 if flipped else after[piece] for piece in kept]
+                        opponent = side if flipped else 1 - side
+                        value = signed(sub_values[opponent * sub_material.size + sub_material.index(sub_squares)])
+                        if value < 0 and (best_capture is None or -value < best_capture):
+                            best_capture = -value  # opponent mated in -value - 1 plies, so we mate in -value
+                        elif value > 0:
+                            worst_capture = max(worst_capture, value)  # opponent mates in value - 1 plies
+                        else:
+                            drawn = True
+                        break
+
+            key = side * size + index
+            if best_capture is not None:
+                wins.setdefault(best_capture, []).append(key)
+            if best_capture is not None or drawn:
+                states[side][index] = safe
+            elif not moves:
+                if in_check(material, squares, side, occupied):
+                    losses.setdefault(0, []).append(key)  # checkmate
+                else:
+                    states[side][index] = safe  # stalemate
+            elif not successors:  # every move is a losing capture
+                losses.setdefault(worst_capture, []).append(key)
+            else:
+                unsolved[side][index] = len(successors)
+                capture_losses[side][index] = worst_capture
+
+    # then backwards a ply at a time from the mates: a position is won if one move reaches a lost position, and lost
+    # once every move reaches a won one
+    plies = 0
+    while wins or losses:
+        for key in losses.pop(plies, ()):
+            side, index = divmod(key, size)
+            if values[side][index]:
+                continue
+            values[side][index] = -plies - 1
+            for predecessor in predecessors(material, index, side):
+                if not values[1 - side][predecessor] and states[1 - side][predecessor] != illegal:
+                    wins.setdefault(plies + 1, []).append((1 - side) * size + predecessor)
+        for key in wins.pop(plies, ()):
+            side, index = divmod(key, size)
+            if values[side][index]:
+                continue
+            values[side][index] = plies + 1
+            for predecessor in predecessors(material, index, side):
+                if values[1 - side][predecessor] or states[1 - side][predecessor]:
+                    continue
+                unsolved[1 - side][predecessor] -= 1
+                if not unsolved[1 - side][predecessor]:
+                    lost = max(plies + 1, capture_losses[1 - side][predecessor])
+                    losses.setdefault(lost, []).append((1 - side) * size + predecessor)
+        plies += 1
+
+    with open(os.path.join(directory, name + ".bin"), "wb") as table:
+        table.write(values[0].tobytes() + values[1].tobytes())
+    longest = max(max(values[0]), max(values[1]))
+    log("%s: %d positions, longest mate %d moves, %.1fs" % (name, 2 * size, longest // 2,
+                                                            time.perf_counter() - start))
+    return values
+
+
+def predecessors(material, index, side):  # positions in the same table one quiet move before, the other side to move
+    squares = material.squares(index)
+    occupied = sum(1 << square for square in squares)
+    found = set()
+    for piece in range(material.count):
+        if material.sides[piece] == side:
+            continue
+        for ray in rays[material.kinds[piece]][squares[piece]]:
+            for start in ray:
+                if occupied >> start & 1:
+                    break
+                before = list(squares)
+                before[piece] = start
+                found.add(material.index(before))
+    return found
+
+
+def before_move(value):  # value of a position from the value of the position after a move, opponent to move
+    return 1 - value if value < 0 else -value - 1 if value > 0 else 0
+
+
+class Tablebase:
+
+    def __init__(self, directory=tablebase_dir):
+        self.directory = directory
+        self.tables = {}  # name -> (file, mmap, Material), or None when there is no file for it
+
+    def table(self, name):
+        if name not in self.tables:
+            path = os.path.join(self.directory, name + ".bin")
+            self.tables[name] = None
+            if os.path.exists(path):
+                material = Material(name)
+                table = open(path, "rb")
+                if os.fstat(table.fileno()).st_size != 2 * material.size:
+                    table.close()
+                    raise ValueError("tablebase file is the wrong size: " + repr(path))
+                self.tables[name] = (table, mmap.mmap(table.fileno(), 0, access=mmap.ACCESS_READ), material)
+        return self.tables[name]
+
+    def probe(self, game_state):
+        """
+        Value of the position from the side to move's point of view: 0 for a draw, otherwise the plies to mate plus
+        one, negative if the side to move gets mated. None when there is no table for it.
+        """
+        if game_state.castle_rights or len(game_state.piece_locs["w"]) + len(game_state.piece_locs["b"]) > max_pieces:
+            return None
+        pieces = {"w": [], "b": []}
+        for color in "wb":
+            for row, col in game_state.piece_locs[color]:
+                kind = game_state.board[row][col][1]
+                if kind == "P":
+                    return None
+                pieces[color].append((piece_order.index(kind), row * 8 + col))
+        name, flipped = table_name(*("".join(piece_order[kind] for kind, _ in sorted(pieces[color]))
+                                     for color in "wb"))
+        if name == "KK":
+            return 0
+        table = self.table(name)
+        if table is None:
+            return None
+        _, data, material = table
+        order = ("b", "w") if flipped else ("w", "b")
+        squares = [square ^ 56 if flipped else square for color in order for _, square in sorted(pieces[color])]
+        side = 0 if game_state.white_to_move != flipped else 1
+        return signed(data[side * material.size + material.index(squares)])
+
+    def best_move(self, game_state, valid_moves):
+        """
+        (move, value) for the best of valid_moves with its value as in probe - the quickest mate, else a draw, else
+        the longest resistance. None when a position isn't in the tables.
+        """
+        if game_state.castle_rights or \
+                len(game_state.piece_locs["w"]) + len(game_state.piece_locs["b"]) > max_pieces or not valid_moves:
+            return None
+        best = best_key = None
+        for move in valid_moves:
+            game_state.make_move(move)
+            value = self.probe(game_state)
+            game_state.undo_move()
+            if value is None:
+                return None
+            value = before_move(value)
+            key = (2, -value) if value > 0 else (0, -value) if value < 0 else (1, 0)
+            if best_key is None or key > best_key:
+                best, best_key = (move, value), key
+        return best
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table[1].close()
+                table[0].close()
+        self.tables = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or probe endgame tablebases.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate tables")
+    build.add_argument("names", nargs="*", default=["KQK", "KRK", "KBK", "KNK"],
+                       help="materials, white first (default every 3 man table)")
+    build.add_argument("--directory", default=tablebase_dir, help="where the tables go")
+    probe = commands.add_parser("probe", help="look a position and its moves up")
+    probe.add_argument("--fen", required=True, help="position")
+    probe.add_argument("--directory", default=tablebase_dir, help="where the tables are")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for name in args.names:
+            name = name.upper()
+            split = name.find("K", 1)
+            if not name.startswith("K") or split < 0 or name.count("K") != 2 or set(name) - set(piece_order) or \
+                    len(name) > max_pieces:
+                parser.error("not a pawnless material of up to %d pieces: %s" % (max_pieces, name))
+            name = table_name(name[:split], name[split:])[0]
+            if not os.path.exists(os.path.join(args.directory, name + ".bin")):
+                generate(name, args.directory)
+        return 0
+
+    tablebase = Tablebase(args.directory)
+    try:
+        game_state = engine.GameState.from_fen(args.fen)
+        value = tablebase.probe(game_state)
+        if value is None:
+            print("not in the tables")
+            return 1
+        print(describe(value))
+        for move in game_state.generate_valid_moves():
+            game_state.make_move(move)
+            value = tablebase.probe(game_state)
+            game_state.undo_move()
+            print("%-6s %s" % (engine.Move(move).uci(), "?" if value is None else describe(before_move(value))))
+    finally:
+        tablebase.close()
+    return 0
+
+
+def describe(value):  # a probe value in words
+    if not value:
+        return "draw"
+    plies = abs(value) - 1
+    return ("mate in %d" if value > 0 else "mated in %d") % ((plies + 1) // 2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
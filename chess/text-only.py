@@ -7,7 +7,7 @@ Handles game state drawing and UI features: key handling, mouse handing, square
 
 #import pygame as p
 from chess import engine, move_finder
-from multiprocessing import Process, Queue
+from chess.worker import EngineWorker
 import time
 
 
@@ -38,7 +38,7 @@ def main():
     white = False  # true if human is playing as white
     black = False
     move_undone = False
-    move_finder_process = None
+    worker = EngineWorker()
     ai_thinking = False
 
     white_time = 0
@@ -58,13 +58,11 @@ def main():
             if not ai_thinking:
                 start_time = time.time()
                 ai_thinking = True
-                return_queue = Queue()  # used to pass data between threads
-                move_finder_process = Process(target=move_finder.find_best_move, args=(game_state, valid_moves,
-                                                                                       return_queue))
-                move_finder_process.start()
+                worker.start_search(game_state.move_log)
 
-            if not move_finder_process.is_alive():
-                ai_move = return_queue.get()
+            result = worker.poll(0.1)  # nothing else to do while the engine thinks
+            if result is not None:
+                ai_move = result.move
                 if ai_move is None:
                     ai_move = move_finder.find_random_moves(valid_moves)
                 game_state.make_move(ai_move)
@@ -79,7 +77,7 @@ def main():
                     b_turn+=1
 
         if move_made:
-            print(game_state.move_log[-1].chess_notation())
+            print(engine.Move(game_state.move_log[-1]).chess_notation())
             valid_moves = game_state.generate_valid_moves()
             move_made = False
             move_undone = False
@@ -90,15 +88,17 @@ def main():
                 print("Black wins by checkmate!")
             else:
                 print("White wins by checkmate!")
-            print("avg white time = " + str(white_time/w_turn))
-            print("avg black time = " + str(black_time/b_turn))
         elif game_state.is_stalemate():
             game_over = True
             print("Stalemate.")
-            print("avg white time = " + str(white_time/w_turn))
-            print("avg black time = " + str(black_time/b_turn))
 
+        if game_over:  # a side that never moved has no average
+            print("avg white time = " + (str(white_time / w_turn) if w_turn else "n/a"))
+            print("avg black time = " + (str(black_time / b_turn) if b_turn else "n/a"))
+            running = False
 
+
+    worker.close()
     return 0
 
 
@@ -0,0 +1,214 @@
+"""
+tournament.py
+
+Self-play match between two engine configurations, for checking that a change to the search didn't cost playing
+strength. Games are played in parallel, one per process at a time, and each is seeded from the match seed so a rerun
+with node budgets replays the same games. Games come in pairs that open with the same random moves and swap colors, so
+neither side is favored by the opening.
+
+A configuration is a comma separated list of find_best_move budgets (nodes, seconds, depth) and SearchOptions fields:
+    python -m chess.tournament --games 40 --a nodes=20000 --b nodes=20000,lmr=False
+    python -m chess.tournament --games 100 --a seconds=0.2 --b seconds=0.2,null_move=False --workers 8
+
+Games end on checkmate, stalemate, threefold repetition, the fifty move rule or bare kings as usual, and are
+adjudicated once both engines agree one side is winning by a wide margin or the move cap is reached.
+
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chess import bitboard, engine, move_finder
+from chess.ordering import MoveOrderer
+from chess.transposition import TranspositionTable
+
+
+default_nodes = 20000  # per move, when a configuration gives no budget
+opening_plies = 4  # random moves at the start of each pair of games
+max_moves = 200  # full moves before a game is called a draw
+resign_score = 6  # pawns - both engines seeing this much for resign_plies in a row ends the game
+resign_plies = 8
+
+budget_keys = ("nodes", "seconds", "depth")
+
+
+def parse_config(text):  # "nodes=20000,lmr=False" -> (find_best_move budget, SearchOptions)
+    budget, options = {"nodes": None, "seconds": None, "depth": None}, {}
+    for item in filter(None, (item.strip() for item in text.split(","))):
+        key, _, value = item.partition("=")
+        key, value = key.strip(), value.strip()
+        if value in ("True", "true", "False", "false"):
+            value = value in ("True", "true")
+        else:
+            try:
+                value = int(value)
+            except ValueError:
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise ValueError("bad value in engine configuration: " + repr(item)) from None
+        (budget if key in budget_keys else options)[key] = value
+    if all(value is None for value in budget.values()):
+        budget["nodes"] = default_nodes
+    try:
+        return budget, move_finder.SearchOptions(**options)
+    except TypeError:
+        raise ValueError("unknown setting in engine configuration: " + repr(text)) from None
+
+
+def insufficient_material(game_state):  # bare kings, or a king and one minor piece against a bare king
+    pieces = [game_state.board[row][col][1] for color in "wb" for row, col in game_state.piece_locs[color]]
+    pieces.remove("K")
+    pieces.remove("K")
+    return not pieces or (len(pieces) == 1 and pieces[0] in "NB")
+
+
+def play_game(seed, white, black, state_class, opening, move_cap, resign):
+    """
+    Play one game between two (budget, options) configurations. Returns the result ("1-0", "0-1" or "1/2-1/2"),
+    why the game ended, the moves played and the seconds each side took per move.
+    """
+    random.seed(seed)
+    game_state = state_class()
+    for _ in range(opening):  # the same moves for both games of a pair, since they share a seed
+        moves = game_state.generate_valid_moves()
+        if not moves:
+            break
+        game_state.make_move(random.choice(moves))
+
+    players = {True: white, False: black}
+    tables = {True: TranspositionTable(move_finder.tt_size), False: TranspositionTable(move_finder.tt_size)}
+    orderers = {True: MoveOrderer(), False: MoveOrderer()}  # neither side gets to read the other's search
+    latencies = {True: [], False: []}
+    scores = []  # from white's point of view, one per search
+    while True:
+        white_to_move = game_state.white_to_move
+        if not game_state.has_legal_move():
+            if game_state.inCheck:
+                return ("0-1" if white_to_move else "1-0"), "checkmate", game_state.move_log, latencies
+            return "1/2-1/2", "stalemate", game_state.move_log, latencies
+        if game_state.halfmove_clock >= 100:
+            return "1/2-1/2", "fifty move rule", game_state.move_log, latencies
+        if game_state.repetitions() >= 2:
+            return "1/2-1/2", "threefold repetition", game_state.move_log, latencies
+        if insufficient_material(game_state):
+            return "1/2-1/2", "insufficient material", game_state.move_log, latencies
+        if len(game_state.move_log) >= 2 * move_cap:
+            return "1/2-1/2", "move cap", game_state.move_log, latencies
+        if resign and len(scores) >= resign_plies:
+            recent = scores[-resign_plies:]
+            if min(recent) >= resign:
+                return "1-0", "adjudicated", game_state.move_log, latencies
+            if max(recent) <= -resign:
+                return "0-1", "adjudicated", game_state.move_log, latencies
+
+        budget, options = players[white_to_move]
+        start = time.perf_counter()
+        valid_moves = game_state.generate_valid_moves()
+        result = move_finder.find_best_move(game_state, valid_moves, orderer=orderers[white_to_move],
+                                            options=options, table=tables[white_to_move], **budget)
+        latencies[white_to_move].append(time.perf_counter() - start)
+        move = result.move
+        if move is None:  # the budget ran out before any root move was searched - play on, like main.py does
+            move = move_finder.find_random_moves(valid_moves)
+        if result.depth:  # an unfinished search has no score to judge resigning by
+            scores.append(result.score if white_to_move else -result.score)
+        game_state.make_move(move)
+
+
+def elo(score):  # rating difference that expects this fraction of the points
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_interval(wins, draws, losses, z=1.96):  # Elo difference and the ends of its (default 95%) confidence interval
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games)
+    margin = z * deviation / math.sqrt(games)
+    return elo(score), elo(score - margin), elo(score + margin)
+
+
+def percentile(values, fraction):  # nearest rank, values sorted
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def run_match(config_a, config_b, games, workers, seed, state_class, opening=opening_plies, move_cap=max_moves,
+              resign=resign_score):
+    """
+    Play games between configurations a and b, printing each result as it comes in. a has white in the first game
+    of each pair. Returns a's wins, draws and losses, and the per-move seconds of each side.
+    """
+    wins = draws = losses = 0
+    latencies = {"a": [], "b": []}
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for game in range(games):
+            white, black = (config_a, config_b) if game % 2 == 0 else (config_b, config_a)
+            future = pool.submit(play_game, seed + game // 2, white, black, state_class, opening, move_cap, resign)
+            futures[future] = game
+        for future in as_completed(futures):
+            game = futures[future]
+            result, reason, move_log, times = future.result()
+            a_white = game % 2 == 0
+            latencies["a"] += times[a_white]
+            latencies["b"] += times[not a_white]
+            if result == "1/2-1/2":
+                draws += 1
+            elif (result == "1-0") == a_white:
+                wins += 1
+            else:
+                losses += 1
+            print("game %d: %s - %s  %s  (%s, %d moves)" % (game + 1, "a" if a_white else "b", "b" if a_white else "a",
+                                                           result, reason, (len(move_log) + 1) // 2), flush=True)
+    return wins, draws, losses, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play two engine configurations against each other.")
+    parser.add_argument("--a", default="", help="first configuration, e.g. nodes=20000,lmr=False")
+    parser.add_argument("--b", default="", help="second configuration")
+    parser.add_argument("--games", type=int, default=20, help="games to play - even, so both sides get each opening")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes (default one per core)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first pair of games")
+    parser.add_argument("--opening", type=int, default=opening_plies, help="random plies to open each pair with")
+    parser.add_argument("--max-moves", type=int, default=max_moves, help="full moves before a game is drawn")
+    parser.add_argument("--resign", type=float, default=resign_score, help="pawns to adjudicate a win at, 0 for never")
+    parser.add_argument("--bitboard", action="store_true", help="use BitboardState instead of GameState")
+    args = parser.parse_args()
+    try:
+        config_a, config_b = parse_config(args.a), parse_config(args.b)
+    except ValueError as error:
+        parser.error(str(error))
+    state_class = bitboard.BitboardState if args.bitboard else engine.GameState
+
+    start = time.perf_counter()
+    wins, draws, losses, latencies = run_match(config_a, config_b, args.games, max(args.workers, 1), args.seed,
+                                               state_class, args.opening, args.max_moves, args.resign)
+    print()
+    print("a: %s\nb: %s" % (args.a or "defaults", args.b or "defaults"))
+    games = wins + draws + losses
+    if games:
+        difference, low, high = elo_interval(wins, draws, losses)
+        print("%d games in %.0fs: a +%d =%d -%d, %.1f%%, Elo %+.0f (95%% %+.0f to %+.0f)" %
+              (games, time.perf_counter() - start, wins, draws, losses, 100 * (wins + draws / 2) / games,
+               difference, low, high))
+    print("ms per move    p50     p90     p99     max")
+    for side in ("a", "b"):
+        times = sorted(latencies[side])
+        if times:
+            print("%-9s" % side + "".join("%8.0f" % (1000 * percentile(times, fraction))
+                                          for fraction in (0.5, 0.9, 0.99, 1)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
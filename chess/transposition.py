@@ -0,0 +1,93 @@
+"""
+transposition.py
+
+Fixed-size transposition table for the move finder. Entries live in flat typed views over a single buffer rather than
+in a dict of objects, so the memory used is set up front and never grows.
+
+The table is split into buckets of two slots. The first slot keeps the deepest result seen for its bucket (it is only
+overwritten by an equal or deeper search, or by anything once it is left over from an older search), the second slot
+is always replaced.
+
+A table can also live in shared memory so several search processes can use it at once (see
+move_finder.find_best_move_parallel). Nothing is locked: each slot's key is stored xor'd with its score and info, so a
+slot half written by one process while another reads it just fails to match the key and is treated as a miss.
+
+"""
+
+from multiprocessing import shared_memory
+
+exact = 0  # score is the true value of the position
+lower_bound = 1  # search failed high - true value is at least the score
+upper_bound = 2  # search failed low - true value is at most the score
+
+entry_size = 24  # bytes per slot - key, score and packed depth/bound/age/move, 8 bytes each
+slots_per_bucket = 2
+
+
+class TranspositionTable:
+
+    def __init__(self, size_mb=16, shared=False, name=None):  # name attaches to a shared table made elsewhere
+
+        buckets = max(1, size_mb * 1024 * 1024 // (entry_size * slots_per_bucket))
+        self.buckets = 1 << (buckets.bit_length() - 1)  # round down to a power of two so the index is a mask
+        self.mask = self.buckets - 1
+        self.slots = self.buckets * slots_per_bucket
+        self.shared_memory = None
+        if shared or name is not None:
+            self.shared_memory = shared_memory.SharedMemory(name, name is None, self.slots * entry_size)
+            self.buffer = self.shared_memory.buf
+        else:
+            self.buffer = bytearray(self.slots * entry_size)
+        self.name = self.shared_memory.name if self.shared_memory else None
+        self.owner = name is None  # whoever made the shared memory removes it
+
+        self.view = memoryview(self.buffer)
+        self.keys = self.view[:self.slots * 8].cast("Q")  # zobrist key ^ score bits ^ info, 0 for an empty slot
+        self.scores = self.view[self.slots * 8:self.slots * 16].cast("d")
+        self.score_bits = self.view[self.slots * 8:self.slots * 16].cast("Q")  # the same scores, as integers
+        self.info = self.view[self.slots * 16:self.slots * 24].cast("Q")  # depth | bound << 8 | age << 10 | move << 16
+        self.age = 0
+
+    def new_search(self):  # entries from earlier searches become fair game for replacement
+        self.age = (self.age + 1) & 0x3F
+
+    def clear(self):
+        self.view[:] = bytes(len(self.view))
+        self.age = 0
+
+    def close(self):  # only needed for a shared table - frees the shared memory once the last user closes it
+        if self.shared_memory is not None:
+            for view in (self.keys, self.scores, self.score_bits, self.info, self.view):
+                view.release()
+            self.shared_memory.close()
+            if self.owner:
+                self.shared_memory.unlink()
+            self.shared_memory = None
+
+    def probe(self, key):  # (depth, score, bound, move) stored for this position, or None
+        slot = (key & self.mask) * slots_per_bucket
+        for i in (slot, slot + 1):
+            info = self.info[i]
+            if self.keys[i] ^ self.score_bits[i] ^ info == key:
+                return info & 0xFF, self.scores[i], (info >> 8) & 0x3, info >> 16
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        slot = (key & self.mask) * slots_per_bucket
+        info = self.info[slot]
+        stored_key = self.keys[slot] ^ self.score_bits[slot] ^ info
+        if stored_key == key or depth >= info & 0xFF or (info >> 10) & 0x3F != self.age:
+            if stored_key != key and self.keys[slot] != 0:  # the old deep entry still gets a second chance
+                self.keys[slot + 1] = self.keys[slot]
+                self.scores[slot + 1] = self.scores[slot]
+                self.info[slot + 1] = info
+        else:
+            slot += 1
+        info = depth | bound << 8 | self.age << 10 | move << 16
+        self.scores[slot] = score
+        self.info[slot] = info
+        self.keys[slot] = key ^ self.score_bits[slot] ^ info
+
+    def usage(self):  # fraction of slots filled, sampled from the first thousand
+        sample = min(self.slots, 1000)
+        return sum(1 for i in range(sample) if self.keys[i] != 0) / sample
@@ -0,0 +1,70 @@
+"""
+worker.py
+
+Long-lived engine process for the front ends. The worker keeps its own copy of the game and is only sent the moves
+that changed since the last search, so nothing but a few ints crosses the process boundary per move. Its
+transposition table and move ordering history stay warm from one move to the next.
+
+"""
+
+from multiprocessing import Event, Process, Queue
+from queue import Empty
+
+from chess import engine, move_finder
+
+
+class EngineWorker:
+
+    def __init__(self, state_class=engine.GameState, **search_args):  # search_args are passed on to find_best_move
+        self.requests = Queue()
+        self.results = Queue()
+        self.stop_event = Event()
+        self.process = Process(target=worker_loop, args=(self.requests, self.results, self.stop_event, state_class,
+                                                          search_args), daemon=True)
+        self.process.start()
+        self.synced = []  # the move log as the worker last saw it
+        self.search_id = 0  # results of earlier, cancelled searches are ignored
+
+    def start_search(self, move_log):  # start searching the position after these moves, poll for the answer
+        common = 0
+        while common < min(len(move_log), len(self.synced)) and move_log[common] == self.synced[common]:
+            common += 1
+        self.search_id += 1
+        self.requests.put(("go", self.search_id, len(self.synced) - common, move_log[common:]))
+        self.synced = list(move_log)
+
+    def poll(self, timeout=0):  # SearchResult of the current search once it is done, None until then
+        while True:
+            try:
+                search_id, result = self.results.get(timeout=timeout) if timeout else self.results.get_nowait()
+            except Empty:
+                return None
+            if search_id == self.search_id:
+                return result
+
+    def stop(self):  # abandon the current search - it still reports, but poll ignores it once another starts
+        self.stop_event.set()
+
+    def close(self):
+        self.stop_event.set()
+        self.requests.put(("quit",))
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def worker_loop(requests, results, stop_event, state_class, search_args):
+    game_state = state_class()
+    while True:
+        request = requests.get()
+        if request[0] == "quit":
+            return
+        _, search_id, undo_count, moves = request
+        stop_event.clear()  # any stop still set was meant for an earlier search
+        for _ in range(undo_count):
+            game_state.undo_move()
+        for move in moves:
+            game_state.make_move(move)
+        result = move_finder.find_best_move(game_state, game_state.generate_valid_moves(), stop_event=stop_event,
+                                            **search_args)
+        results.put((search_id, result))
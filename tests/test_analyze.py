@@ -0,0 +1,55 @@
+import io
+import json
+
+from chess import analyze, engine, move_finder
+
+
+search_args = {"seconds": None, "depth": 2, "nodes": None}
+
+
+def run(text, workers=2):
+    output = io.StringIO()
+    count, _ = analyze.analyze(io.StringIO(text), output, workers, engine.GameState, search_args)
+    results = {result["line"]: result for result in map(json.loads, output.getvalue().splitlines())}
+    assert len(results) == count
+    return results
+
+
+def test_bad_line_between_good_ones():
+    results = run("\n".join([
+        engine.start_fen,
+        "P6k/8/8/8/8/8/8/K7 w - - 0 1",  # pawn on the last rank
+        '6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - id "back rank";',
+    ]))
+    assert sorted(results) == [1, 2, 3]
+    assert "error" in results[2] and "move" not in results[2]
+    assert results[1]["depth"] == 2 and "score" in results[1]
+    assert results[3]["id"] == "back rank"
+    assert results[3]["move"] == "a1a8" and results[3]["forced_mate"]
+
+
+def test_search_error_becomes_a_record(monkeypatch):
+    def broken(*args, **kwargs):
+        raise IndexError("list index out of range")
+
+    monkeypatch.setattr(move_finder, "find_best_move", broken)
+    result = analyze.analyze_position(7, engine.start_fen, None, engine.GameState, search_args)
+    assert result == {"line": 7, "fen": engine.start_fen, "error": "IndexError: list index out of range"}
+
+
+def test_budget_out_before_depth_one_has_no_score():
+    kiwipete = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+    search_args = {"seconds": None, "depth": None, "nodes": 600}
+    result = analyze.analyze_position(1, kiwipete, None, engine.GameState, search_args)
+    assert result["incomplete"] and result["depth"] == 0 and "score" not in result
+
+
+def test_epd_fields():
+    positions = list(analyze.read_positions([
+        "# comment\n",
+        "\n",
+        'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - bm e4; id "start";\n',
+        engine.start_fen + "\n",
+    ]))
+    assert positions == [(3, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -", "start"),
+                         (4, engine.start_fen, None)]
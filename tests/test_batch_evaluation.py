@@ -0,0 +1,34 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from chess import batch_evaluation, engine, move_finder  # noqa: E402
+
+
+fens = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "4k3/8/8/8/8/8/8/4K2Q b - - 0 1",
+]
+
+
+def test_matches_static_score():
+    states = [engine.GameState.from_fen(fen) for fen in fens]
+    codes = batch_evaluation.encode_boards(states)
+    expected = [round(move_finder.static_score(state) * 100) for state in states]
+    assert batch_evaluation.evaluate_codes(codes).tolist() == expected
+    assert batch_evaluation.evaluate(batch_evaluation.codes_to_planes(codes)).tolist() == expected
+
+
+def test_codes_from_bytes():
+    states = [engine.GameState.from_fen(fen) for fen in fens]
+    data = b"".join(state.to_bytes() for state in states)
+    assert np.array_equal(batch_evaluation.codes_from_bytes(data), batch_evaluation.encode_boards(states))
+    with pytest.raises(ValueError):
+        batch_evaluation.codes_from_bytes(data[:-1])
+
+
+def test_bad_codes():
+    with pytest.raises(ValueError):
+        batch_evaluation.evaluate_codes(np.full((1, 64), len(engine.pieces), dtype=np.int8))
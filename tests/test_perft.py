@@ -0,0 +1,12 @@
+import pytest
+
+from chess import bitboard, engine, perft
+
+
+@pytest.mark.parametrize("state_class", [engine.GameState, bitboard.BitboardState])
+@pytest.mark.parametrize("name, fen, expected", perft.positions, ids=[name for name, _, _ in perft.positions])
+def test_known_counts(state_class, name, fen, expected):
+    game_state = perft.load_fen(fen, state_class)
+    for depth in (1, 2, 3):
+        assert perft.perft(game_state, depth) == expected[depth], (name, depth)
+    assert game_state.to_fen().startswith(fen)  # every move undone
@@ -0,0 +1,76 @@
+import pytest
+
+from chess import bitboard, engine
+
+
+state_classes = [engine.GameState, bitboard.BitboardState]
+
+good_fens = [
+    engine.start_fen,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3",
+]
+
+bad_fens = [
+    "",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",  # seven ranks
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQXBNR w KQkq - 0 1",  # unknown piece
+    "rnbq1bnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQ - 0 1",  # no black king
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",  # bad side to move
+    "P6k/8/8/8/8/8/8/K7 w - - 0 1",  # pawn on the last rank
+    "7k/8/8/8/8/8/8/K5p1 b - - 0 1",  # pawn on the first rank
+    "k6R/8/8/8/8/8/8/K7 w - - 0 1",  # black, not to move, is in check
+    "4k3/8/8/8/8/8/8/r3K3 b - - 0 1",  # white, not to move, is in check
+    "4k3/8/8/8/8/8/8/4K3 w K - 0 1",  # castling rights with no rook
+    "4k3/8/8/8/8/8/8/6K1 w K - 0 1",  # castling rights with the king off e1
+    "4k3/8/8/3P4/8/8/8/4K3 w - e6 0 1",  # en passant square with no pawn in front of it
+    "4k3/8/8/8/4P3/8/8/4K3 w - e3 0 1",  # en passant square for the wrong side
+]
+
+
+@pytest.mark.parametrize("state_class", state_classes)
+@pytest.mark.parametrize("fen", good_fens)
+def test_fen_and_bytes_round_trip(state_class, fen):
+    game_state = state_class.from_fen(fen)
+    assert game_state.to_fen() == fen
+    data = game_state.to_bytes()
+    assert len(data) == engine.position_size
+    assert state_class.from_bytes(data).to_fen() == fen
+
+
+@pytest.mark.parametrize("state_class", state_classes)
+@pytest.mark.parametrize("fen", bad_fens)
+def test_bad_fen_raises(state_class, fen):
+    with pytest.raises(ValueError):
+        state_class.from_fen(fen)
+
+
+@pytest.mark.parametrize("state_class", state_classes)
+def test_bad_position_leaves_state_alone(state_class):
+    game_state = state_class()
+    with pytest.raises(ValueError):
+        game_state.set_fen("k6R/8/8/8/8/8/8/K7 w - - 0 1")
+    assert game_state.to_fen() == engine.start_fen
+
+
+def bytes_with_square(data, square, code):  # a to_bytes record with one square's piece code replaced
+    squares = bytearray(data[:32])
+    shift = 0 if square & 1 else 4
+    squares[square // 2] = squares[square // 2] & ~(15 << shift) | code << shift
+    return bytes(squares) + data[32:]
+
+
+@pytest.mark.parametrize("state_class", state_classes)
+def test_bad_bytes_raise(state_class):
+    data = engine.GameState.from_fen("7k/8/8/8/8/8/8/K7 w - - 0 1").to_bytes()
+    with pytest.raises(ValueError):  # white pawn on a8
+        state_class.from_bytes(bytes_with_square(data, 1, engine.piece_codes["wP"]))
+    with pytest.raises(ValueError):  # black pawn on h1
+        state_class.from_bytes(bytes_with_square(data, 62, engine.piece_codes["bP"]))
+    with pytest.raises(ValueError):  # white rook on g8 checks the black king, with white to move
+        state_class.from_bytes(bytes_with_square(data, 6, engine.piece_codes["wR"]))
+    with pytest.raises(ValueError):  # bad piece code
+        state_class.from_bytes(bytes_with_square(data, 20, 15))
+    with pytest.raises(ValueError):  # en passant byte off the board
+        state_class.from_bytes(data[:33] + bytes([200]) + data[34:])
@@ -0,0 +1,55 @@
+import multiprocessing
+
+import pytest
+
+from chess import engine, move_finder
+from chess.move_finder import SearchOptions
+from chess.ordering import MoveOrderer
+
+
+middlegame = "r1bq1rk1/pp2bppp/2n2n2/3p4/3P4/2NBPN2/PP3PPP/R2QK2R w KQ - 0 9"
+
+
+def null_moves_tried(monkeypatch, options):
+    count = 0
+    make_null_move = engine.GameState.make_null_move
+
+    def counted(game_state):
+        nonlocal count
+        count += 1
+        make_null_move(game_state)
+
+    monkeypatch.setattr(engine.GameState, "make_null_move", counted)
+    game_state = engine.GameState.from_fen(middlegame)
+    move_finder.transposition_table.clear()
+    move_finder.find_best_move(game_state, game_state.generate_valid_moves(), seconds=None, depth=4,
+                               orderer=MoveOrderer(), options=options, book=None, tablebase=None)
+    return count
+
+
+@pytest.mark.parametrize("pvs", [True, False])
+def test_null_move_does_not_need_pvs(monkeypatch, pvs):
+    assert null_moves_tried(monkeypatch, SearchOptions(pvs=pvs))
+
+
+def test_null_move_switches_off(monkeypatch):
+    assert not null_moves_tried(monkeypatch, SearchOptions(null_move=False))
+
+
+def crash(*args):
+    raise RuntimeError("helper crashed")
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="patches have to reach the helpers")
+@pytest.mark.parametrize("patch", ["helper", "table"])
+def test_failed_helpers_do_not_hang_the_search(monkeypatch, patch):
+    if patch == "helper":  # dies before putting anything on the queue
+        monkeypatch.setattr(move_finder, "lazy_smp_helper", crash)
+    else:  # can't attach to the shared table, so the helper puts an empty result
+        table_class = move_finder.TranspositionTable
+        monkeypatch.setattr(move_finder, "TranspositionTable",
+                            lambda size, shared=False, name=None: crash() if name else table_class(size, shared))
+    game_state = engine.GameState()
+    result = move_finder.find_best_move_parallel(game_state, game_state.generate_valid_moves(), workers=3,
+                                                 seconds=None, depth=2, book=None, tablebase=None)
+    assert result.move is not None and result.depth == 2
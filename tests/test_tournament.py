@@ -0,0 +1,10 @@
+from chess import engine, move_finder, tournament
+from chess.move_finder import SearchOptions, SearchResult
+
+
+def test_search_without_a_move_still_plays(monkeypatch):
+    monkeypatch.setattr(move_finder, "find_best_move", lambda *args, **kwargs: SearchResult())
+    player = ({"nodes": 1}, SearchOptions())
+    result, reason, moves, latencies = tournament.play_game(1, player, player, engine.GameState, 2, 10, 5)
+    assert reason == "move cap" and result == "1/2-1/2" and len(moves) == 20
+    assert len(latencies[True]) == len(latencies[False]) == 9